@@ -0,0 +1,75 @@
+# benchmarks/load_test_service.py
+import sys
+import json
+import time
+import argparse
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+def _scenarios(n, distinct, regions, seed):
+    """`n` requests drawn from `distinct` random weight vectors / region filters."""
+    rng = np.random.default_rng(seed)
+    pool = []
+    for _ in range(distinct):
+        scenario = {"weights": rng.dirichlet(np.ones(3)).round(4).tolist()}
+        if regions and rng.random() < 0.3:
+            scenario["regions"] = rng.choice(regions, size=max(2, len(regions) // 2), replace=False).tolist()
+        pool.append(json.dumps(scenario).encode('utf-8'))
+    return [pool[i] for i in rng.integers(0, distinct, size=n)]
+
+def _post(url, body, geojson):
+    if not geojson:
+        body = json.dumps({**json.loads(body), "geojson": False}).encode('utf-8')
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except urllib.error.URLError:
+        ok = False
+    return time.perf_counter() - started, ok
+
+def run(base_url, n_requests, concurrency, distinct, geojson=True, seed=42):
+    """Sends scenario requests from `concurrency` threads; returns throughput and latency percentiles."""
+    with urllib.request.urlopen(f"{base_url}/regions", timeout=30) as response:
+        regions = json.loads(response.read())
+    bodies = _scenarios(n_requests, distinct, regions, seed)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda body: _post(f"{base_url}/scenario", body, geojson), bodies))
+    elapsed = time.perf_counter() - started
+    latency = np.array([r[0] for r in results]) * 1000
+    return {"requests": n_requests, "concurrency": concurrency, "distinct_scenarios": distinct, "geojson": geojson,
+            "errors": int(sum(not r[1] for r in results)), "elapsed_s": elapsed,
+            "requests_per_s": n_requests / elapsed if elapsed > 0 else None,
+            "latency_ms_p50": float(np.percentile(latency, 50)), "latency_ms_p95": float(np.percentile(latency, 95)),
+            "latency_ms_p99": float(np.percentile(latency, 99))}
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the what-if service (src/whatif_service.py).")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--distinct", type=int, default=50, help="distinct scenarios (controls the cache hit rate)")
+    parser.add_argument("--no-geojson", action="store_true", help="request rankings only")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for concurrency in args.concurrency:
+        result = run(args.url, args.requests, concurrency, args.distinct, geojson=not args.no_geojson)
+        results.append(result)
+        print(f"concurrency={concurrency:3d}: {result['requests_per_s']:8.1f} req/s, "
+              f"p50={result['latency_ms_p50']:.2f} ms, p95={result['latency_ms_p95']:.2f} ms, "
+              f"p99={result['latency_ms_p99']:.2f} ms, errors={result['errors']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, indent=2)
+        print(f"Results written to {args.output}")
+    sys.exit(1 if any(r["errors"] for r in results) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/run_benchmarks.py
+import os
+import sys
+import json
+import argparse
+import tempfile
+import importlib
+import importlib.util
+import platform
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from synthetic_data import (make_admin_grid, make_layer_polygons, write_layer_archives, make_paper_corpus,
+                            hashing_encoder)
+from profiling import profile_section, RECORDS
+from spatial_aggregation import aggregate_layer_areas
+
+# Problem sizes per scale; every benchmark runs at each size to show how throughput scales
+SCALES = {
+    "small": {"regions": [9, 36], "density": [0.5, 2.0], "papers": [200, 1000]},
+    "medium": {"regions": [36, 144], "density": [2.0, 8.0], "papers": [1000, 5000]},
+    "large": {"regions": [144, 400], "density": [8.0, 20.0], "papers": [5000, 20000]},
+}
+
+def _result(record, case, **params):
+    result = {"case": case, **params, "rows": record["rows"], "wall_s": record["wall_s"], "cpu_s": record["cpu_s"],
+              "max_rss_mb": record["max_rss_mb"], "rss_growth_mb": record["rss_growth_mb"]}
+    result["rows_per_s"] = record["rows"] / record["wall_s"] if record["wall_s"] > 0 else None
+    return result
+
+def bench_ingestion(n_regions, density, n_jobs, seed):
+    """process_shapefiles_in_dir over synthetic zips, in-archive and with a process pool."""
+    preprocessing = importlib.import_module("01_geospatial_preprocessing")
+    layers = make_layer_polygons(make_admin_grid(n_regions), density, seed=seed, sources=("Supply",))
+    with tempfile.TemporaryDirectory() as tmp:
+        write_layer_archives(layers, tmp, n_archives=4)
+        with profile_section("bench_ingestion", rows=len(layers)) as record:
+            preprocessing.process_shapefiles_in_dir(tmp, "Supply", in_archive=True, n_jobs=n_jobs)
+    return _result(record, "ingestion", regions=n_regions, density=density, n_jobs=n_jobs)
+
+def bench_aggregation(n_regions, density, n_jobs, seed):
+    """Stage-02 region aggregation (aggregate_layer_areas)."""
+    admin = make_admin_grid(n_regions)
+    layers = make_layer_polygons(admin, density, seed=seed)
+    with profile_section("bench_aggregation", rows=len(layers)) as record:
+        aggregate_layer_areas(layers, admin, n_jobs=n_jobs)
+    return _result(record, "aggregation", regions=n_regions, density=density, n_jobs=n_jobs)
+
+def bench_paper_analyzer(n_papers, seed, topics=True):
+    """
+    AdvancedPaperAnalyzer end to end with an offline hashing encoder.
+    Without BERTopic installed (or with topics=False) only the loading, indicator,
+    GBR and scoring steps are timed.
+    """
+    analysis = importlib.import_module("05_paper_impact_analysis")
+    if topics and importlib.util.find_spec("bertopic") is None:
+        print("  BERTopic is not installed; timing the paper analyzer without topic modeling.")
+        topics = False
+    with tempfile.TemporaryDirectory() as tmp:
+        paper_file = os.path.join(tmp, "papers.parquet")
+        make_paper_corpus(n_papers, seed=seed).to_parquet(paper_file, index=False)
+        analyzer = analysis.AdvancedPaperAnalyzer(paper_file, cache_dir=os.path.join(tmp, "cache"),
+                                                  embedding_model="hashing-64", encode_fn=hashing_encoder())
+        with profile_section("bench_paper_analyzer", rows=n_papers) as record:
+            if topics:
+                analyzer.run_analysis()
+            else:
+                analyzer.load_and_preprocess()
+                analyzer.calculate_indicators()
+                analyzer.optimize_weights_with_ml()
+                analyzer.calculate_final_impact_scores()
+    return _result(record, "paper_analyzer", papers=n_papers, topics=topics)
+
+def run_suite(scale="small", n_jobs=2, seed=42, topics=True):
+    sizes = SCALES[scale]
+    results = []
+    for n_regions in sizes["regions"]:
+        for density in sizes["density"]:
+            print(f"--- regions={n_regions}, features/km2={density} ---")
+            results.append(bench_ingestion(n_regions, density, n_jobs, seed))
+            results.append(bench_aggregation(n_regions, density, n_jobs, seed))
+    for n_papers in sizes["papers"]:
+        print(f"--- papers={n_papers} ---")
+        result = bench_paper_analyzer(n_papers, seed, topics=topics)
+        if result is not None:
+            results.append(result)
+    return results
+
+def _case_key(result):
+    return json.dumps({k: v for k, v in result.items()
+                       if k not in ("rows", "wall_s", "cpu_s", "max_rss_mb", "rss_growth_mb", "rows_per_s")}, sort_keys=True)
+
+def compare_to_baseline(results, baseline_file, tolerance=0.25):
+    """Lists cases whose throughput fell by more than `tolerance` against a saved run."""
+    with open(baseline_file, encoding='utf-8') as fh:
+        baseline = {_case_key(r): r for r in json.load(fh)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get(_case_key(result))
+        if not before or not before.get("rows_per_s") or not result.get("rows_per_s"):
+            continue
+        change = result["rows_per_s"] / before["rows_per_s"] - 1
+        if change < -tolerance:
+            regressions.append((_case_key(result), change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic-data benchmarks of the pipeline hot paths.")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--jobs", type=int, default=2, help="worker processes for ingestion and aggregation")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-topics", action="store_true", help="skip embedding and topic modeling")
+    parser.add_argument("--output", default=os.path.join("output", "profiling", "benchmarks.json"))
+    parser.add_argument("--baseline", help="earlier benchmarks.json to compare throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput drop (fraction)")
+    args = parser.parse_args()
+
+    results = run_suite(args.scale, n_jobs=args.jobs, seed=args.seed, topics=not args.no_topics)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as fh:
+        json.dump({"scale": args.scale, "seed": args.seed, "python": platform.python_version(),
+                   "cpu_count": os.cpu_count(), "results": results, "sections": RECORDS},
+                  fh, ensure_ascii=False, indent=2)
+
+    print("\nCase            Rows      Seconds   Rows/s      RSS growth / max (MiB)")
+    for r in results:
+        print(f"{r['case']:<15} {r['rows']:<9} {r['wall_s']:<9.2f} {r['rows_per_s'] or 0:<11.0f} "
+              f"{r['rss_growth_mb'] or 0:.0f} / {r['max_rss_mb'] or 0:.0f}")
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        for case, change in regressions:
+            print(f"REGRESSION {case}: throughput {change:+.0%}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
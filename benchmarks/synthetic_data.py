@@ -0,0 +1,87 @@
+# benchmarks/synthetic_data.py
+import os
+import zipfile
+import tempfile
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import box
+
+# South-west corner of the synthetic study area in EPSG:5179 (roughly central Korea)
+ORIGIN = (950000.0, 1900000.0)
+SOURCES = ("Supply", "Demand", "Environment")
+WORDS = ("zero", "energy", "building", "thermal", "insulation", "photovoltaic", "heat", "pump", "envelope",
+         "ventilation", "retrofit", "simulation", "optimization", "district", "grid", "storage", "daylight",
+         "occupant", "comfort", "certification", "lifecycle", "carbon", "facade", "geothermal", "control")
+
+def make_admin_grid(n_regions, region_size_m=10000.0):
+    """
+    Administrative polygons as a near-square grid of `n_regions` cells; granularity is
+    controlled by `n_regions`. Region names follow the Korean SIDO_NM column.
+    """
+    n_cols = int(np.ceil(np.sqrt(n_regions)))
+    x0, y0 = ORIGIN
+    cells = [box(x0 + (i % n_cols) * region_size_m, y0 + (i // n_cols) * region_size_m,
+                 x0 + (i % n_cols + 1) * region_size_m, y0 + (i // n_cols + 1) * region_size_m)
+             for i in range(n_regions)]
+    return gpd.GeoDataFrame({'SIDO_NM': [f'지역{i}' for i in range(n_regions)]}, geometry=cells, crs="EPSG:5179")
+
+def make_layer_polygons(admin_gdf, features_per_km2=1.0, seed=42, sources=SOURCES, max_size_m=2000.0):
+    """
+    Random rectangles over the extent of `admin_gdf`, `features_per_km2` per source.
+    Rectangles straddle region borders, so both the clipped and the contained paths are exercised.
+    """
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = admin_gdf.total_bounds
+    n = max(1, int(round(features_per_km2 * (maxx - minx) * (maxy - miny) / 1e6)))
+    frames = []
+    for source in sources:
+        xy = rng.uniform((minx, miny), (maxx, maxy), size=(n, 2))
+        wh = rng.uniform(50.0, max_size_m, size=(n, 2))
+        geoms = [box(x, y, x + w, y + h) for (x, y), (w, h) in zip(xy, wh)]
+        frames.append(gpd.GeoDataFrame({'SOURCE': source, 'VAL': np.arange(n)}, geometry=geoms, crs=admin_gdf.crs))
+    return pd.concat(frames, ignore_index=True)
+
+def write_layer_archives(gdf, directory, n_archives=4, encoding="cp949"):
+    """Splits `gdf` into `n_archives` zipped shapefiles in `directory`, as in data/raw."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, part in enumerate(np.array_split(np.arange(len(gdf)), n_archives)):
+        with tempfile.TemporaryDirectory() as tmp:
+            gdf.iloc[part].drop(columns='SOURCE', errors='ignore').to_file(
+                os.path.join(tmp, f"layer{i}.shp"), encoding=encoding)
+            path = os.path.join(directory, f"layer{i}.zip")
+            with zipfile.ZipFile(path, 'w') as zf:
+                for f in sorted(os.listdir(tmp)):
+                    zf.write(os.path.join(tmp, f), f)
+        paths.append(path)
+    return paths
+
+def make_paper_corpus(n_papers, seed=42, n_themes=6, words_per_abstract=80):
+    """
+    Fake paper list with the columns of academic_papers_list.xlsx
+    (영문 초록, KCI 피인용 횟수, 저자, 논문발행연도). Abstracts are drawn from a few
+    word themes so that topic models find structure.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = np.array(WORDS)
+    themes = [rng.choice(len(vocab), size=8, replace=False) for _ in range(n_themes)]
+    theme = rng.integers(0, n_themes, size=n_papers)
+    abstracts = []
+    for t in theme:
+        words = np.where(rng.random(words_per_abstract) < 0.7, rng.choice(themes[t], words_per_abstract),
+                         rng.integers(0, len(vocab), words_per_abstract))
+        abstracts.append(" ".join(vocab[words]))
+    n_authors = rng.integers(1, 7, size=n_papers)
+    return pd.DataFrame({
+        '영문 초록': abstracts,
+        'KCI 피인용 횟수': rng.poisson(3 + 2 * theme),
+        '저자': [";".join(f"저자{j}" for j in rng.integers(0, 500, k)) for k in n_authors],
+        '논문발행연도': rng.integers(2005, 2025, size=n_papers),
+    })
+
+def hashing_encoder(dim=64):
+    """Offline stand-in for the sentence-transformers encoder: hashed bag of words, L2-normalized."""
+    from sklearn.feature_extraction.text import HashingVectorizer
+    vectorizer = HashingVectorizer(n_features=dim, alternate_sign=False, norm='l2')
+    return lambda docs: vectorizer.transform(docs).toarray().astype(np.float32)
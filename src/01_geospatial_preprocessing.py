@@ -1,18 +1,185 @@
 # src/01_geospatial_preprocessing.py
 import os
+import re
+import sys
+import json
+import codecs
+import hashlib
+import sqlite3
 import geopandas as gpd
 import pandas as pd
+import pyogrio
+import shapely
 import zipfile
 import shutil
-from utils import fix_korean, ensure_dir
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils import repair_korean_columns, ensure_dir
+from layer_store import store_path_for, read_store_meta, write_layer_store, drop_store_partitions
+from profiling import profile_section, add_record, write_run_report
 
-def process_shapefiles_in_dir(target_dir, source_label, target_crs="EPSG:5179"):
+# DBF language driver IDs (byte 29 of the header) seen in Korean and common GIS exports.
+# 0x57 ("ANSI", the system code page of the writer) is left out: Korean exports tagged
+# with it are usually cp949, so it falls through to the default.
+DBF_LANGUAGE_CODEPAGES = {
+    0x01: "cp437", 0x02: "cp850", 0x03: "cp1252",
+    0x79: "cp949", 0x7A: "cp936", 0x7B: "cp932", 0x78: "cp950",
+    0xC8: "cp1250", 0xC9: "cp1251", 0xCA: "cp1254", 0xCB: "cp1253",
+}
+DEFAULT_SHAPEFILE_ENCODING = "cp949"
+# Bumped when ingestion adds columns, so that every zip is re-ingested (2: FEATURE_ID)
+MANIFEST_VERSION = 2
+
+def cpg_codec(label):
+    """
+    Encoding name for the label of a .cpg sidecar, or None when unrecognised.
+    Tries the label itself ("UTF-8", "EUC-KR"), then its code page number as an ESRI
+    ISO label ("88591" -> iso8859-1) or a Windows code page ("ANSI 1252", "949" -> cp1252, cp949).
+    Candidates are validated with codecs.lookup but returned as spelled, since GDAL
+    (iconv) does not know Python's canonical names such as "euc_kr".
+    """
+    label = label.strip().lower()
+    digits = "".join(re.findall(r"\d+", label))
+    candidates = [] if label.isdigit() else [label]  # Python alone accepts bare numbers such as "949"
+    if digits.startswith("8859") and len(digits) > 4:
+        candidates.append(f"iso8859-{digits[4:]}")
+    if digits:
+        candidates.append(f"cp{digits}")
+    for candidate in candidates:
+        try:
+            name = codecs.lookup(candidate).name
+        except LookupError:
+            continue
+        return "utf-8" if name == "utf-8" else candidate  # e.g. "65001"
+    return None
+
+def detect_shapefile_encoding(zip_ref, shp_member):
+    """
+    Picks the attribute encoding of a zipped shapefile without parsing it.
+    Uses the .cpg sidecar when its label is a known codec, then the DBF language
+    driver byte, and falls back to cp949 (EUC-KR superset) for the national LSMD exports.
+    """
+    stem = os.path.splitext(shp_member)[0]
+    members = {name.lower(): name for name in zip_ref.namelist()}
+
+    cpg = members.get(f"{stem}.cpg".lower())
+    if cpg:
+        codec = cpg_codec(zip_ref.read(cpg).decode("ascii", errors="ignore"))
+        if codec:
+            return codec
+
+    dbf = members.get(f"{stem}.dbf".lower())
+    if dbf:
+        with zip_ref.open(dbf) as fh:
+            header = fh.read(32)
+        if len(header) >= 30 and header[29] in DBF_LANGUAGE_CODEPAGES:
+            return DBF_LANGUAGE_CODEPAGES[header[29]]
+    return DEFAULT_SHAPEFILE_ENCODING
+
+def read_zip_archive(zip_path, source_label, target_crs="EPSG:5179", repair_text=False):
+    """
+    Reads every shapefile inside one zip through GDAL's /vsizip/ handler.
+    Runs in a worker process: the batch is re-projected and labelled here so
+    that only a finished GeoDataFrame is sent back to the parent.
+    With `repair_text` mojibake Korean columns are repaired as each file is read.
+    FEATURE_ID numbers the features of the zip in reading order, so that
+    (ZIP_FILE, FEATURE_ID) identifies a feature across runs.
+    Returns (GeoDataFrame or None, list of log messages); the seconds spent
+    re-projecting are kept in the result's attrs["reproject_s"].
+    """
+    item = os.path.basename(zip_path)
+    messages, gdf_list = [], []
+    reproject_s = 0.0
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            shp_members = [m for m in zip_ref.namelist() if m.lower().endswith(".shp")]
+            encodings = {m: detect_shapefile_encoding(zip_ref, m) for m in shp_members}
+    except (zipfile.BadZipFile, NotImplementedError) as e:
+        return None, [f"Could not process zip file {item}: {e}"]
+
+    for member, encoding in encodings.items():
+        file = os.path.basename(member)
+        try:
+            gdf = gpd.read_file(f"/vsizip/{os.path.abspath(zip_path)}/{member}", encoding=encoding)
+            repaired = repair_korean_columns(gdf)[1] if repair_text else []
+            if gdf.crs is None or gdf.crs.to_epsg() != 5179:
+                started = time.perf_counter()
+                gdf = gdf.to_crs(target_crs)
+                reproject_s += time.perf_counter() - started
+            gdf['SOURCE'] = source_label
+            gdf['ZIP_FILE'] = item
+            gdf_list.append(gdf)
+            messages.append(f"  + Successfully loaded and processed {file} ({encoding})"
+                            + (f"; repaired Korean text in {', '.join(repaired)}" if repaired else ""))
+        except Exception as e:
+            messages.append(f"  - ERROR reading {file}: {e}")
+
+    if not gdf_list:
+        return None, messages
+    merged = pd.concat(gdf_list, ignore_index=True)
+    merged['FEATURE_ID'] = range(len(merged))
+    merged.attrs["reproject_s"] = reproject_s
+    return merged, messages
+
+def record_reprojection(batches, source_label):
+    """Adds the worker-side re-projection time of ingested batches to the run report."""
+    batches = [gdf for gdf in batches if gdf is not None]
+    add_record("reprojection", sum(gdf.attrs.get("reproject_s", 0.0) for gdf in batches),
+               rows=sum(len(gdf) for gdf in batches), source=source_label, measured_in="workers")
+
+def process_shapefiles_in_archives(target_dir, source_label, target_crs="EPSG:5179", n_jobs=None, repair_text=False):
+    """
+    Extraction-free variant of process_shapefiles_in_dir.
+    - Reads shapefiles straight from the zips (GDAL /vsizip/), no temp files.
+    - Fans the zips out to a process pool of `n_jobs` workers (all cores by default).
+    - Merges the re-projected batches into a single GeoDataFrame.
+    """
+    print(f"--- Processing directory (in-archive): {target_dir} ---")
+    if not os.path.isdir(target_dir):
+        print(f"!!! WARNING: Directory not found: {target_dir}. Skipping.")
+        return None
+
+    zip_paths = sorted(os.path.join(target_dir, f) for f in os.listdir(target_dir) if f.lower().endswith(".zip"))
+    if not zip_paths:
+        print(f"No .zip files found in {target_dir}.")
+        return None
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(zip_paths))
+    gdf_list = []
+    with profile_section("zip_ingestion", source=source_label, archives=len(zip_paths), n_jobs=n_jobs) as record:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            for gdf, messages in executor.map(read_zip_archive, zip_paths, [source_label] * len(zip_paths),
+                                              [target_crs] * len(zip_paths), [repair_text] * len(zip_paths)):
+                for message in messages:
+                    print(message)
+                if gdf is not None:
+                    gdf_list.append(gdf)
+        record["rows"] = sum(len(gdf) for gdf in gdf_list)
+    record_reprojection(gdf_list, source_label)
+
+    if not gdf_list:
+        print(f"No shapefiles were successfully processed in {target_dir}.")
+        return None
+
+    merged_gdf = pd.concat(gdf_list, ignore_index=True)
+    print(f"✅ Successfully merged {len(merged_gdf)} features from {source_label}.")
+    return merged_gdf
+
+def process_shapefiles_in_dir(target_dir, source_label, target_crs="EPSG:5179", in_archive=False, n_jobs=None,
+                              repair_text=False):
     """
     Processes all shapefiles within a directory of zip files.
     - Extracts shapefiles from zips.
     - Reads, re-projects to a unified CRS.
     - Merges them into a single GeoDataFrame.
+    With `in_archive=True` the zips are read in place by a process pool instead
+    (see process_shapefiles_in_archives). `repair_text` repairs mojibake Korean
+    columns as each shapefile is read.
     """
+    if in_archive:
+        return process_shapefiles_in_archives(target_dir, source_label, target_crs, n_jobs=n_jobs,
+                                              repair_text=repair_text)
+
     print(f"--- Processing directory: {target_dir} ---")
     if not os.path.isdir(target_dir):
         print(f"!!! WARNING: Directory not found: {target_dir}. Skipping.")
@@ -31,6 +198,7 @@ def process_shapefiles_in_dir(target_dir, source_label, target_crs="EPSG:5179"):
 
     for item in zip_files:
         zip_path = os.path.join(target_dir, item)
+        n_zip_features = 0
         try:
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
                 zip_ref.extractall(extract_path)
@@ -46,15 +214,20 @@ def process_shapefiles_in_dir(target_dir, source_label, target_crs="EPSG:5179"):
                                     gdf = gpd.read_file(shp_path, encoding="euc-kr")
                                 except Exception:
                                     gdf = gpd.read_file(shp_path, encoding="utf-8")
+                                repaired = repair_korean_columns(gdf)[1] if repair_text else []
 
                                 # Unify CRS
                                 if gdf.crs is None or gdf.crs.to_epsg() != 5179:
-                                    gdf = gdf.to_crs(target_crs)
+                                    with profile_section("reprojection", rows=len(gdf), source=source_label):
+                                        gdf = gdf.to_crs(target_crs)
                                 
                                 gdf['SOURCE'] = source_label
                                 gdf['ZIP_FILE'] = item
+                                gdf['FEATURE_ID'] = range(n_zip_features, n_zip_features + len(gdf))
+                                n_zip_features += len(gdf)
                                 gdf_list.append(gdf)
-                                print(f"  + Successfully loaded and processed {file}")
+                                print(f"  + Successfully loaded and processed {file}"
+                                      + (f"; repaired Korean text in {', '.join(repaired)}" if repaired else ""))
                             except Exception as e:
                                 print(f"  - ERROR reading {file}: {e}")
 
@@ -76,10 +249,212 @@ def process_shapefiles_in_dir(target_dir, source_label, target_crs="EPSG:5179"):
     print(f"✅ Successfully merged {len(merged_gdf)} features from {source_label}.")
     return merged_gdf
 
-def main():
+def file_sha256(path, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def manifest_path_for(output_gpkg):
+    """Manifest file stored next to a processed GeoPackage."""
+    return os.path.splitext(output_gpkg)[0] + "_manifest.json"
+
+def load_manifest(manifest_path):
+    """Archives recorded in a manifest; empty (full re-ingestion) for a missing or older manifest."""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf-8') as fh:
+        manifest = json.load(fh)
+    if manifest.get("version", 1) != MANIFEST_VERSION:
+        print("  Manifest written by an older ingestion; re-ingesting every archive.")
+        return {}
+    return manifest.get("archives", {})
+
+def save_manifest(manifest_path, archives):
+    with open(manifest_path, 'w', encoding='utf-8') as fh:
+        json.dump({"version": MANIFEST_VERSION, "archives": archives}, fh, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+
+def scan_archives(dirs_to_process, previous):
+    """
+    Lists the source zips of every SOURCE directory with their content hash.
+    Zips whose size and mtime match the previous manifest reuse the stored hash,
+    so an unchanged raw drop is not re-read.
+    """
+    current = {}
+    for source, target_dir in dirs_to_process.items():
+        if not os.path.isdir(target_dir):
+            print(f"!!! WARNING: Directory not found: {target_dir}. Skipping.")
+            continue
+        for item in sorted(f for f in os.listdir(target_dir) if f.lower().endswith(".zip")):
+            zip_path = os.path.join(target_dir, item)
+            stat = os.stat(zip_path)
+            key = f"{source}/{item}"
+            old = previous.get(key)
+            if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+                sha256 = old["sha256"]
+            else:
+                sha256 = file_sha256(zip_path)
+            current[key] = {"source": source, "zip_file": item, "path": zip_path,
+                            "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+    return current
+
+def delete_archive_rows(output_gpkg, layer, keys):
+    """Removes the features of the given (SOURCE, ZIP_FILE) pairs from a GeoPackage layer."""
+    conn = sqlite3.connect(output_gpkg)
+    try:
+        with conn:
+            deleted = sum(conn.execute(f'DELETE FROM "{layer}" WHERE "SOURCE" = ? AND "ZIP_FILE" = ?', key).rowcount
+                          for key in keys)
+    finally:
+        conn.close()
+    return deleted
+
+def sync_archives_to_gpkg(dirs_to_process, output_gpkg, layer, postprocess=None, n_jobs=None,
+                          target_crs="EPSG:5179", repair_text=False):
+    """
+    Incrementally keeps a GeoPackage layer in step with its source zips.
+    - A manifest next to the GeoPackage records hash, feature count and bounds per zip.
+    - Only new or changed zips are re-ingested; rows of changed or vanished zips are deleted.
+    - New rows are appended; the layer is rewritten only on a first run or a schema change.
+    Returns (number of features in the layer, set of SOURCE labels whose rows changed).
+    """
+    manifest_path = manifest_path_for(output_gpkg)
+    previous = load_manifest(manifest_path) if os.path.exists(output_gpkg) else {}
+    current = scan_archives(dirs_to_process, previous)
+
+    removed = [k for k in previous if k not in current]
+    changed = [k for k in current if k in previous and previous[k]["sha256"] != current[k]["sha256"]]
+    added = [k for k in current if k not in previous]
+    print(f"  Manifest: {len(added)} new, {len(changed)} changed, {len(removed)} removed, "
+          f"{len(current) - len(added) - len(changed)} unchanged archives.")
+
+    archives = {k: dict(previous[k], size=v["size"], mtime_ns=v["mtime_ns"])
+                for k, v in current.items() if k in previous and k not in changed}
+    touched = {(previous.get(k) or current[k])["source"] for k in removed + changed + added}
+    if not (removed or changed or added):
+        save_manifest(manifest_path, archives)
+        # The layer was verified against its sources in this run; mark it as fresh for run_pipeline
+        if os.path.exists(output_gpkg):
+            os.utime(output_gpkg)
+        return sum(entry["feature_count"] for entry in archives.values()), touched
+
+    to_ingest = changed + added
+    batches = []
+    if to_ingest:
+        n_workers = min(n_jobs or os.cpu_count() or 1, len(to_ingest))
+        with profile_section("zip_ingestion", source=layer, archives=len(to_ingest), n_jobs=n_workers) as record:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                results = executor.map(read_zip_archive, [current[k]["path"] for k in to_ingest],
+                                       [current[k]["source"] for k in to_ingest], [target_crs] * len(to_ingest),
+                                       [repair_text] * len(to_ingest))
+                for key, (gdf, messages) in zip(to_ingest, results):
+                    for message in messages:
+                        print(message)
+                    entry = {k: v for k, v in current[key].items() if k != "path"}
+                    if gdf is not None and len(gdf):
+                        reproject_s = gdf.attrs.get("reproject_s", 0.0)
+                        if postprocess is not None:
+                            gdf = postprocess(gdf)
+                        gdf.attrs["reproject_s"] = reproject_s
+                        batches.append(gdf)
+                        entry.update(feature_count=len(gdf), bounds=[float(b) for b in gdf.total_bounds])
+                    else:
+                        entry.update(feature_count=0, bounds=None)
+                    archives[key] = entry
+            record["rows"] = sum(len(gdf) for gdf in batches)
+        record_reprojection(batches, layer)
+
+    new_rows = pd.concat(batches, ignore_index=True) if batches else None
+    if not previous:
+        if new_rows is None:
+            return 0, touched
+        new_rows.to_file(output_gpkg, driver="GPKG", layer=layer)
+    else:
+        stale = [(previous[k]["source"], previous[k]["zip_file"]) for k in removed + changed]
+        if stale:
+            print(f"  - Deleted {delete_archive_rows(output_gpkg, layer, stale)} stale features.")
+        if new_rows is not None:
+            existing_fields = set(pyogrio.read_info(output_gpkg, layer=layer)["fields"])
+            if set(new_rows.columns) - {new_rows.geometry.name} <= existing_fields:
+                new_rows.to_file(output_gpkg, driver="GPKG", layer=layer, mode="a")
+            else:
+                print("  Schema changed; rewriting the layer.")
+                merged = pd.concat([gpd.read_file(output_gpkg, layer=layer), new_rows], ignore_index=True)
+                merged.to_file(output_gpkg, driver="GPKG", layer=layer)
+            print(f"  + Appended {len(new_rows)} features.")
+
+    save_manifest(manifest_path, archives)
+    return sum(entry["feature_count"] for entry in archives.values()), touched
+
+def fix_admin_korean(admin_gdf):
+    """
+    Fixes broken Korean characters in the text columns of already loaded administrative
+    data. Ingestion repairs them while reading instead (`repair_text=True`).
+    """
+    admin_gdf, repaired = repair_korean_columns(admin_gdf)
+    if repaired:
+        print(f"  Repaired Korean text in {', '.join(repaired)}")
+    return admin_gdf
+
+def assign_sido(gdf, admin_gdf, region_col='SIDO_NM'):
+    """Labels each feature with the admin region containing its representative point."""
+    points = gdf.geometry.representative_point().to_numpy()
+    tree = shapely.STRtree(admin_gdf.geometry.to_numpy())
+    point_idx, region_idx = tree.query(points, predicate='within')
+    labels = pd.Series("UNKNOWN", index=gdf.index, dtype=object)
+    labels.iloc[point_idx[::-1]] = admin_gdf[region_col].to_numpy()[region_idx[::-1]]
+    return gdf.assign(**{region_col: labels.to_numpy()})
+
+def refresh_parquet_stores(processed_path, output_gpkg_all, output_gpkg_admin, touched_sources, admin_touched,
+                           partition_by_sido=False, rebuild=False):
+    """
+    Mirrors the processed GeoPackages into partitioned GeoParquet stores.
+    Layers are partitioned by SOURCE (and SIDO_NM when `partition_by_sido`); only
+    the SOURCE partitions listed in `touched_sources` are rewritten unless `rebuild`.
+    """
+    admin_store = store_path_for(processed_path, "admin_boundaries")
+    layers_store = store_path_for(processed_path, "all_layers")
+    layer_partitions = ["SOURCE", "SIDO_NM"] if partition_by_sido else ["SOURCE"]
+
+    admin_gdf = None
+    if os.path.exists(output_gpkg_admin) and (admin_touched or read_store_meta(admin_store) is None):
+        admin_gdf = gpd.read_file(output_gpkg_admin)
+        write_layer_store(admin_gdf, admin_store, partition_cols=["SIDO_NM"] if partition_by_sido else [],
+                          spatial_sort=False)
+        print(f">>> Administrative boundaries store written to {admin_store}")
+
+    meta = read_store_meta(layers_store)
+    rebuild = rebuild or meta is None or meta["partition_cols"] != layer_partitions or (partition_by_sido and admin_touched)
+    if rebuild:
+        if os.path.isdir(layers_store):
+            shutil.rmtree(layers_store)
+        touched_sources = set(pyogrio.read_dataframe(output_gpkg_all, columns=["SOURCE"], read_geometry=False)["SOURCE"])
+    if partition_by_sido and touched_sources and admin_gdf is None:
+        admin_gdf = gpd.read_file(output_gpkg_admin, columns=["SIDO_NM"])
+
+    for source in sorted(touched_sources):
+        quoted = source.replace("'", "''")
+        gdf = gpd.read_file(output_gpkg_all, where=f"SOURCE = '{quoted}'")
+        if not len(gdf):
+            drop_store_partitions(layers_store, "SOURCE", [source])
+            continue
+        if partition_by_sido:
+            gdf = assign_sido(gdf, admin_gdf)
+        write_layer_store(gdf, layers_store, partition_cols=layer_partitions, replace="partitions")
+        print(f">>> {source} partition ({len(gdf)} features) written to {layers_store}")
+
+def main(in_archive=True, n_jobs=None, incremental=True, write_parquet=True, partition_by_sido=False):
     """
     Main function to run the geospatial preprocessing pipeline.
     This script generates the necessary GeoPackage (.gpkg) files from raw downloaded data.
+    Zips are read in place by `n_jobs` worker processes unless `in_archive` is False.
+    With `incremental=True` only new or changed zips are re-ingested (see sync_archives_to_gpkg).
+    With `write_parquet=True` the results are also mirrored to partitioned GeoParquet stores
+    read by the analysis stages through layer_store.load_processed_layer.
+    Returns 1 (the script's exit code) when a layer could not be produced.
     """
     base_raw_path = "data/raw"
     processed_path = "data/processed"
@@ -93,37 +468,62 @@ def main():
         "Environment": os.path.join(base_raw_path, "02_geospatial_layers", "environment"),
     }
 
+    output_gpkg_all = os.path.join(processed_path, "LSMD_CONT_ALL.gpkg")
+    output_gpkg_admin = os.path.join(processed_path, "LSMD_CONT_ADMIN_ALL.gpkg")
+    admin_dir = os.path.join(base_raw_path, "03_administrative_boundaries")
+
+    if incremental:
+        n_features, touched_sources = sync_archives_to_gpkg(dirs_to_process, output_gpkg_all, "all_layers", n_jobs=n_jobs)
+        if n_features:
+            print(f"\n>>> All layers up to date in {output_gpkg_all}\n")
+        else:
+            print("\n!!! ERROR: No main geospatial layers were processed. Cannot create LSMD_CONT_ALL.gpkg. Please check your raw data folders.\n")
+            return 1
+
+        print("STEP 2: Processing administrative boundaries...")
+        n_admin, admin_touched = sync_archives_to_gpkg({"AdminBoundary": admin_dir}, output_gpkg_admin, "admin_boundaries",
+                                                       n_jobs=n_jobs, repair_text=True)
+        if n_admin:
+            print(f"\n>>> Administrative boundaries up to date in {output_gpkg_admin}\n")
+        else:
+            print("\n!!! ERROR: No administrative boundaries were processed. Please check the 'data/raw/03_administrative_boundaries' folder.\n")
+        if write_parquet:
+            refresh_parquet_stores(processed_path, output_gpkg_all, output_gpkg_admin, touched_sources,
+                                   bool(admin_touched), partition_by_sido=partition_by_sido)
+        return None if n_admin else 1
+
     # Process each category of geospatial layers
     all_gdfs = []
     for source, path in dirs_to_process.items():
-        gdf = process_shapefiles_in_dir(path, source)
+        gdf = process_shapefiles_in_dir(path, source, in_archive=in_archive, n_jobs=n_jobs)
         if gdf is not None:
             all_gdfs.append(gdf)
 
     # Combine all layers into a single master file if any were processed
     if all_gdfs:
         all_layers = pd.concat(all_gdfs, ignore_index=True)
-        output_gpkg_all = os.path.join(processed_path, "LSMD_CONT_ALL.gpkg")
         all_layers.to_file(output_gpkg_all, driver="GPKG", layer="all_layers")
         print(f"\n>>> All layers saved to {output_gpkg_all}\n")
     else:
         print("\n!!! ERROR: No main geospatial layers were processed. Cannot create LSMD_CONT_ALL.gpkg. Please check your raw data folders.\n")
-        return
+        return 1
 
     print("STEP 2: Processing administrative boundaries...")
-    admin_dir = os.path.join(base_raw_path, "03_administrative_boundaries")
-    admin_gdf = process_shapefiles_in_dir(admin_dir, "AdminBoundary")
+    admin_gdf = process_shapefiles_in_dir(admin_dir, "AdminBoundary", in_archive=in_archive, n_jobs=n_jobs,
+                                          repair_text=True)
     
     if admin_gdf is not None:
-        # Fix broken Korean characters in the administrative data
-        for col in admin_gdf.select_dtypes(include=['object']).columns:
-            admin_gdf[col] = fix_korean(admin_gdf[col])
-        
-        output_gpkg_admin = os.path.join(processed_path, "LSMD_CONT_ADMIN_ALL.gpkg")
         admin_gdf.to_file(output_gpkg_admin, driver="GPKG", layer="admin_boundaries")
         print(f"\n>>> Administrative boundaries saved to {output_gpkg_admin}\n")
     else:
         print("\n!!! ERROR: No administrative boundaries were processed. Please check the 'data/raw/03_administrative_boundaries' folder.\n")
 
+    if write_parquet:
+        refresh_parquet_stores(processed_path, output_gpkg_all, output_gpkg_admin, set(all_layers['SOURCE']),
+                               admin_gdf is not None, partition_by_sido=partition_by_sido, rebuild=True)
+    return None if admin_gdf is not None else 1
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    exit_code = main()
+    write_run_report("01")
+    sys.exit(exit_code)
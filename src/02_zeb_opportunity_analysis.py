@@ -1,36 +1,78 @@
 # src/02_zeb_opportunity_analysis.py
-import geopandas as gpd
 import pandas as pd
 import numpy as np
 import os
+import sys
 from sklearn.preprocessing import minmax_scale
-import matplotlib.pyplot as plt
-from utils import add_north_arrow, add_scale_bar, ensure_dir
+from utils import ensure_dir
+from spatial_aggregation import RegionAreaAccumulator, aggregate_layer_chunks, RATIO_COLUMNS
+from layer_store import load_processed_layer, iter_processed_layer
+from topsis import (enhanced_topsis, entropy_weights, combine_weights, vector_normalize, benefit_mask,
+                    topsis_sensitivity, sensitivity_summary)
+from spatial_autocorrelation import autocorrelation_report
+from profiling import profile_section, write_run_report
+from raster_surface import load_or_build_coverage, load_or_build_labels, zonal_ratios, cell_opportunity, coverage_dir
+from map_rendering import admin_for_figure, render_figures
 
-def enhanced_topsis(matrix, weights, benefit_criteria):
-    """Performs TOPSIS analysis with normalized data."""
-    norm_matrix = matrix / np.sqrt(np.sum(matrix**2, axis=0))
-    weighted_matrix = norm_matrix * weights
-    
-    pis = np.zeros(matrix.shape[1])
-    nis = np.zeros(matrix.shape[1])
-    
-    for i in range(matrix.shape[1]):
-        if i in benefit_criteria:
-            pis[i] = np.max(weighted_matrix[:, i])
-            nis[i] = np.min(weighted_matrix[:, i])
-        else: # Cost criteria
-            pis[i] = np.min(weighted_matrix[:, i])
-            nis[i] = np.max(weighted_matrix[:, i])
-            
-    dist_pis = np.sqrt(np.sum((weighted_matrix - pis)**2, axis=1))
-    dist_nis = np.sqrt(np.sum((weighted_matrix - nis)**2, axis=1))
-    
-    closeness = dist_nis / (dist_pis + dist_nis)
-    return closeness
+CRITERIA_LABELS = ['Supply Ratio', 'Demand Ratio', 'Environmental Constraint Ratio']
+
+def methodology_details(indicator_matrix, subjective_weights, final_weights, benefit_criteria, distance):
+    """Weights and ideal points behind the index (methodology_details.csv)."""
+    objective_weights, entropy_values = entropy_weights(indicator_matrix)
+    weighted = vector_normalize(indicator_matrix) * final_weights
+    mask = benefit_mask(weighted.shape[1], benefit_criteria)
+    return pd.DataFrame([
+        {'id': 'entropy_weights', 'objective_weights': np.asarray(objective_weights).tolist(),
+         'entropy_values': np.asarray(entropy_values).tolist(), 'weight_labels': CRITERIA_LABELS},
+        {'id': 'combined_weights', 'objective_weights': np.asarray(objective_weights).tolist(),
+         'subjective_weights': np.asarray(subjective_weights).tolist(),
+         'final_combined_weights': np.asarray(final_weights).tolist(),
+         'combination_method': 'geometric_mean'},
+        {'id': 'topsis_details', 'pis': np.where(mask, weighted.max(axis=0), weighted.min(axis=0)).tolist(),
+         'nis': np.where(mask, weighted.min(axis=0), weighted.max(axis=0)).tolist(),
+         'use_mahalanobis_distance': distance == 'mahalanobis'},
+    ])
+
+def grid_surface_outputs(gdf_admin, processed_path, reports_path, figures_path, cell_size, weights,
+                         benefit_criteria, distance="euclidean"):
+    """
+    Rasterized alternative to the polygon overlay: coverage of the layers on a fixed
+    `cell_size` grid, regional ratios by zonal summation and a cell-level TOPSIS surface.
+    Returns the regional table, the surface and the render job of its figure.
+    """
+    coverage, grid = load_or_build_coverage(processed_path, gdf_admin.total_bounds, cell_size)
+    directory = coverage_dir(processed_path, cell_size)
+    labels = load_or_build_labels(directory, grid, gdf_admin, "sido")
+
+    df_grid = zonal_ratios(coverage, labels, gdf_admin, region_col='SIDO_NM')
+    matrix = df_grid[list(RATIO_COLUMNS.values())].values
+    df_grid['ZEB_Opportunity_Index'] = minmax_scale(enhanced_topsis(matrix, weights, benefit_criteria, distance=distance),
+                                                    feature_range=(0, 100))
+    grid_csv = os.path.join(reports_path, "zeb_opportunity_grid_regions.csv")
+    df_grid.to_csv(grid_csv, index=False, encoding='utf-8-sig')
+
+    surface_file = os.path.join(directory, "opportunity.npy")
+    surface = np.lib.format.open_memmap(surface_file, mode='w+', dtype=np.float32, shape=labels.shape)
+    cell_opportunity(coverage, labels, weights, benefit_criteria, distance=distance, out=surface)
+    surface.flush()
+    print(f"Grid surface ({grid.nx} x {grid.ny} cells) saved to {grid_csv} and {surface_file}")
+    figure_job = {"path": os.path.join(figures_path, "zeb_opportunity_surface.png"), "surface": surface_file,
+                  "extent": grid.extent, "title": f'ZEB Opportunity Surface ({cell_size:g} m cells)'}
+    return df_grid, surface, figure_job
 
-def main():
-    """Main function to run the ZEB opportunity analysis."""
+def main(n_jobs=1, weighting="subjective", distance="euclidean", n_sensitivity_samples=1000, seed=42,
+         weights_method="queen", streaming=False, max_features=100000, grid_cell_size=None):
+    """
+    Main function to run the ZEB opportunity analysis.
+    `n_jobs` > 1 spreads the region aggregation over several processes.
+    With `streaming=True` the layers are read and aggregated in chunks of at most
+    `max_features` features (bounded memory, same results as the in-memory path).
+    `grid_cell_size` (metres, e.g. 100) adds the rasterized opportunity surface (see grid_surface_outputs).
+    `weighting` is "subjective" or "combined" (entropy x subjective, geometric mean) and
+    `distance` is "euclidean" or "mahalanobis"; `n_sensitivity_samples` perturbed weight
+    vectors are scored in one batched pass for the sensitivity outputs.
+    `weights_method` selects the spatial weights of the Moran's I / LISA outputs.
+    """
     processed_path = "data/processed"
     output_path = "output"
     reports_path = os.path.join(output_path, "reports")
@@ -38,55 +80,98 @@ def main():
     ensure_dir(reports_path)
     ensure_dir(figures_path)
 
-    # Load data
+    # Load data and calculate indicators per administrative region.
+    # Only the polygons of the three analysed sources within the admin extent are needed.
+    layer_filter = dict(columns=['SOURCE'], partitions={'SOURCE': list(RATIO_COLUMNS)})
     try:
-        gdf_layers = gpd.read_file(os.path.join(processed_path, "LSMD_CONT_ALL.gpkg"))
-        gdf_admin = gpd.read_file(os.path.join(processed_path, "LSMD_CONT_ADMIN_ALL.gpkg"))
+        gdf_admin = load_processed_layer("admin_boundaries", processed_path)
+        with profile_section("overlay_aggregation", regions=len(gdf_admin), n_jobs=n_jobs,
+                             streaming=streaming) as record:
+            if streaming:
+                chunks = iter_processed_layer("all_layers", processed_path, bbox=gdf_admin.total_bounds,
+                                              chunk_size=max_features, **layer_filter)
+                accumulator = aggregate_layer_chunks(chunks, gdf_admin, region_col='SIDO_NM', n_jobs=n_jobs)
+            else:
+                gdf_layers = load_processed_layer("all_layers", processed_path, bbox=gdf_admin.total_bounds,
+                                                  **layer_filter)
+                accumulator = RegionAreaAccumulator(gdf_admin, region_col='SIDO_NM').add(gdf_layers, n_jobs=n_jobs)
+                del gdf_layers
+            record["rows"] = accumulator.n_features
     except Exception as e:
         print(f"Error loading data: {e}. Please run script '01_geospatial_preprocessing.py' first.")
-        return
-
-    # Calculate indicators per administrative region
-    results = []
-    for index, region in gdf_admin.iterrows():
-        region_geom = region.geometry
-        
-        supply_area = gpd.overlay(gdf_layers[gdf_layers['SOURCE'] == 'Supply'], gpd.GeoDataFrame([region], columns=['geometry'], crs=gdf_admin.crs), how='intersection').area.sum()
-        demand_area = gpd.overlay(gdf_layers[gdf_layers['SOURCE'] == 'Demand'], gpd.GeoDataFrame([region], columns=['geometry'], crs=gdf_admin.crs), how='intersection').area.sum()
-        env_area = gpd.overlay(gdf_layers[gdf_layers['SOURCE'] == 'Environment'], gpd.GeoDataFrame([region], columns=['geometry'], crs=gdf_admin.crs), how='intersection').area.sum()
-        
-        results.append({
-            'SIDO_NM': region['SIDO_NM'],
-            'supply_ratio': supply_area / region_geom.area if region_geom.area > 0 else 0,
-            'demand_ratio': demand_area / region_geom.area if region_geom.area > 0 else 0,
-            'env_constraint_ratio': env_area / region_geom.area if region_geom.area > 0 else 0,
-        })
-    
-    df_analysis = pd.DataFrame(results)
+        return 1
+    df_analysis = accumulator.ratios()
+    accumulator.admin_stats().to_csv(os.path.join(reports_path, "admin_stats.csv"), index=False, encoding='utf-8-sig')
     
     indicator_matrix = df_analysis[['supply_ratio', 'demand_ratio', 'env_constraint_ratio']].values
     
     subjective_weights = np.array([0.4, 0.4, 0.2])
     benefit_criteria = [0, 1] # supply_ratio, demand_ratio
+    if weighting == "combined":
+        weights = combine_weights(entropy_weights(indicator_matrix)[0], subjective_weights)
+    else:
+        weights = subjective_weights
     
-    zeb_index = enhanced_topsis(indicator_matrix, subjective_weights, benefit_criteria)
+    with profile_section("topsis", rows=len(indicator_matrix), samples=n_sensitivity_samples, distance=distance):
+        zeb_index = enhanced_topsis(indicator_matrix, weights, benefit_criteria, distance=distance)
+        # Monte Carlo weight sensitivity, scored in one batched TOPSIS pass
+        stats = topsis_sensitivity(indicator_matrix, weights, benefit_criteria, n_samples=n_sensitivity_samples,
+                                   distance=distance, seed=seed).set_index(df_analysis.index)
     df_analysis['ZEB_Opportunity_Index'] = minmax_scale(zeb_index, feature_range=(0, 100))
+    # The closeness CI goes through the same min-max transform as the index it sits next to
+    # (fixed by the baseline scores, so bounds of the extreme regions can fall outside 0-100)
+    span = zeb_index.max() - zeb_index.min()
+    to_index = (lambda x: (x - zeb_index.min()) / span * 100) if span > 0 else (lambda x: 0.0)
+    
+    df_analysis['topsis_score'] = stats['topsis_score']
+    df_analysis['ranking'] = stats['ranking']
+    df_analysis['sensitivity'] = [str({
+        'score_stability': float(row.score_stability),
+        'ranking_stability': float(row.ranking_stability),
+        'stability_interpretation_ko': row.stability_interpretation_ko,
+        'stability_interpretation_en': row.stability_interpretation_en,
+        'confidence_interval_lower': float(to_index(row.confidence_interval_lower)),
+        'confidence_interval_upper': float(to_index(row.confidence_interval_upper)),
+    }) for row in stats.itertuples()]
     
-    gdf_results = gdf_admin.merge(df_analysis, on='SIDO_NM')
+    sensitivity_csv = os.path.join(reports_path, "sensitivity_analysis_summary.csv")
+    sensitivity_summary(stats).to_csv(sensitivity_csv, index=False, encoding='utf-8-sig')
+    methodology_csv = os.path.join(reports_path, "methodology_details.csv")
+    methodology_details(indicator_matrix, subjective_weights, weights, benefit_criteria, distance).to_csv(
+        methodology_csv, index=False, encoding='utf-8-sig')
+    print(f"Sensitivity ({n_sensitivity_samples} weight samples) and methodology saved to {reports_path}")
+    
+    gdf_results = gdf_admin.join(df_analysis.drop(columns='SIDO_NM'))
     
     output_csv = os.path.join(reports_path, "zeb_opportunity_index.csv")
     gdf_results.drop(columns='geometry').to_csv(output_csv, index=False, encoding='utf-8-sig')
     print(f"ZEB Opportunity Index saved to {output_csv}")
     
-    fig, ax = plt.subplots(1, 1, figsize=(12, 12))
-    gdf_results.plot(column='ZEB_Opportunity_Index', cmap='viridis', linewidth=0.8, ax=ax, edgecolor='0.8', legend=True)
-    ax.set_title('ZEB Opportunity Index by Region', fontdict={'fontsize': '16', 'fontweight': '3'})
-    ax.set_axis_off()
-    add_north_arrow(ax)
-    add_scale_bar(ax)
-    plt.savefig(os.path.join(figures_path, "zeb_opportunity_map.png"), dpi=300)
-    print(f"Map saved to {os.path.join(figures_path, 'zeb_opportunity_map.png')}")
-    plt.close()
+    global_stats, lisa = autocorrelation_report(gdf_results, ['ZEB_Opportunity_Index'], method=weights_method, seed=seed)
+    # Same layout as the original report (id,0 with p_value and interpretation rows); p_norm/p_sim are extra rows
+    global_stats.set_axis([0], axis=1).to_csv(os.path.join(reports_path, "spatial_autocorrelation.csv"),
+                                              index_label='id', encoding='utf-8-sig')
+    lisa.insert(0, 'SIDO_NM', gdf_results['SIDO_NM'])
+    lisa.to_csv(os.path.join(reports_path, "lisa_zeb_opportunity.csv"), index=False, encoding='utf-8-sig')
+    print(f"Moran's I = {global_stats.loc['moran_i', 'ZEB_Opportunity_Index']:.4f} ({weights_method} weights)")
+    
+    # Figures use admin boundaries simplified to the output resolution and render in parallel
+    gdf_plot = admin_for_figure(gdf_admin, processed_path)
+    figure_jobs = [{"path": os.path.join(figures_path, "zeb_opportunity_map.png"), "column": 'ZEB_Opportunity_Index',
+                    "gdf": gdf_plot.merge(df_analysis[['SIDO_NM', 'ZEB_Opportunity_Index']].drop_duplicates('SIDO_NM'),
+                                           on='SIDO_NM'),
+                    "title": 'ZEB Opportunity Index by Region'}]
+    if grid_cell_size:
+        with profile_section("grid_surface", cell_size=grid_cell_size):
+            _, _, surface_job = grid_surface_outputs(gdf_admin, processed_path, reports_path, figures_path,
+                                                     grid_cell_size, weights, benefit_criteria, distance=distance)
+        figure_jobs.append({**surface_job, "boundary": gdf_plot})
+
+    with profile_section("map_rendering", rows=len(gdf_plot), figures=len(figure_jobs)):
+        for path in render_figures(figure_jobs, n_jobs=n_jobs):
+            print(f"Map saved to {path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    exit_code = main()
+    write_run_report("02")
+    sys.exit(exit_code)
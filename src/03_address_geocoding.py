@@ -1,15 +1,32 @@
 # src/03_address_geocoding.py
-import pandas as pd
 import geopandas as gpd
 from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
-from shapely.geometry import Point
 import os
+import sys
 from utils import ensure_dir
+from region_classifier import RegionClassifier
+from table_io import read_table
+from geocoding import BatchGeocoder, GeocodeCache, GazetteerProvider, GeopyProvider
+from profiling import profile_section, write_run_report
 
-def main():
+def default_providers(raw_path):
+    """
+    Provider chain used by main(): the offline gazetteer
+    (data/raw/address_gazetteer.csv) when present, then Nominatim at 1 request/s.
+    """
+    providers = []
+    gazetteer_file = os.path.join(raw_path, "address_gazetteer.csv")
+    if os.path.exists(gazetteer_file):
+        providers.append(GazetteerProvider(gazetteer_file))
+    geolocator = Nominatim(user_agent="zeb_mismatch_analysis_korea_v1")
+    providers.append(GeopyProvider(geolocator, name="nominatim", min_delay_seconds=1))
+    return providers
+
+def main(providers=None, cache_ttl_days=365, negative_ttl_days=30):
     """
     Geocodes addresses and joins them with administrative boundaries.
+    Results are cached in data/processed/geocode_cache.sqlite, so reruns only
+    request addresses that are new or whose cache entry expired.
     """
     raw_path = "data/raw"
     processed_path = "data/processed"
@@ -21,35 +38,39 @@ def main():
 
     if not os.path.exists(address_file):
         print(f"ERROR: Address file not found at '{address_file}'. Please provide it.")
-        return
+        return 1
     if not os.path.exists(admin_file):
         print(f"ERROR: Admin boundaries not found at '{admin_file}'. Please run script 01 first.")
-        return
+        return 1
 
-    df = pd.read_excel(address_file)
+    df = read_table(address_file, cache_dir=os.path.join(processed_path, "table_cache"))
     if 'address' not in df.columns:
         print("ERROR: Excel file must contain a column named 'address'.")
-        return
+        return 1
 
-    geolocator = Nominatim(user_agent="zeb_mismatch_analysis_korea_v1")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
-    
-    df['location'] = df['address'].apply(geocode)
-    df['point'] = df['location'].apply(lambda loc: (loc.longitude, loc.latitude) if loc else None)
-    
-    df.dropna(subset=['point'], inplace=True)
-    df[['longitude', 'latitude']] = pd.DataFrame(df['point'].tolist(), index=df.index)
+    cache = GeocodeCache(os.path.join(processed_path, "geocode_cache.sqlite"),
+                         ttl=cache_ttl_days * 24 * 3600, negative_ttl=negative_ttl_days * 24 * 3600)
+    geocoder = BatchGeocoder(providers or default_providers(raw_path), cache)
+    with profile_section("geocoding", rows=len(df)) as record:
+        df[['latitude', 'longitude']] = geocoder.geocode_series(df['address'])
+        record["requests"] = geocoder.request_count
+    print(f"Issued {geocoder.request_count} geocoding requests.")
     
-    geometry = [Point(xy) for xy in zip(df['longitude'], df['latitude'])]
-    gdf_points = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+    df.dropna(subset=['latitude', 'longitude'], inplace=True)
     
-    gdf_admin = gpd.read_file(admin_file)
-    gdf_points_proj = gdf_points.to_crs(gdf_admin.crs)
+    # Points outside every polygon (e.g. on the coast) take the nearest region
+    classifier = RegionClassifier.from_processed(processed_path, columns=['SIDO_NM'])
+    with profile_section("region_assignment", rows=len(df)):
+        df = classifier.classify_frame(df, x_col='longitude', y_col='latitude', crs="EPSG:4326")
     
-    gdf_joined = gpd.sjoin(gdf_points_proj, gdf_admin[['SIDO_NM', 'geometry']], how="left", predicate='within')
+    gdf_points = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df['longitude'], df['latitude']), crs="EPSG:4326")
+    with profile_section("reprojection", rows=len(gdf_points)):
+        gdf_joined = gdf_points.to_crs(classifier.crs)
     
     gdf_joined.to_file(output_gpkg, driver="GPKG")
     print(f"Geocoded addresses with admin info saved to {output_gpkg}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    exit_code = main()
+    write_run_report("03")
+    sys.exit(exit_code)
@@ -1,43 +1,120 @@
 # src/04_research_complex_analysis.py
 import geopandas as gpd
+import pandas as pd
+import hashlib
+import importlib
 import os
+import sys
 from utils import ensure_dir
+from layer_store import load_processed_layer
+from profiling import write_run_report
+from facility_index import FacilityIndex, point_coords, source_feature_ids
 
-def main():
+COMPLEX_ID_SCHEME = "ZIP_FILE:feature"  # part of the index fingerprint, so older pickles with positional ids are rebuilt
+
+def zip_dir_fingerprint(target_dir):
+    """Cheap fingerprint of a directory of zips (names, sizes and mtimes)."""
+    digest = hashlib.sha256()
+    for item in sorted(f for f in os.listdir(target_dir) if f.lower().endswith(".zip")):
+        stat = os.stat(os.path.join(target_dir, item))
+        digest.update(f"{item}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+def load_complex_index(raw_path, index_file):
+    """
+    Loads the persisted research-complex index, rebuilding it only when the
+    zips in `raw_path` changed since it was saved. Complexes are identified by
+    their zip file and feature number (see source_feature_ids).
+    """
+    fingerprint = hashlib.sha256(f"{COMPLEX_ID_SCHEME};{zip_dir_fingerprint(raw_path)}".encode()).hexdigest()
+    index = FacilityIndex.load(index_file, fingerprint=fingerprint)
+    if index is not None:
+        print(f"Loaded research complex index ({len(index.ids)} complexes) from {index_file}")
+        return index
+
+    # We re-use the processing function from script 01
+    process_shapefiles_in_dir = importlib.import_module("01_geospatial_preprocessing").process_shapefiles_in_dir
+    gdf_complexes = process_shapefiles_in_dir(raw_path, "ResearchComplex", in_archive=True)
+    if gdf_complexes is None:
+        return None
+
+    gdf_complexes.index = source_feature_ids(gdf_complexes)
+    index = FacilityIndex.from_gdf(gdf_complexes, keep_attributes=True, fingerprint=fingerprint)
+    index.save(index_file)
+    print(f"Research complex index saved to {index_file}")
+    return index
+
+def supply_demand_proximity(processed_path, k=3, radii_km=(5, 10, 20)):
+    """
+    Nearest-demand metrics for every Supply feature (centroid to centroid).
+    Supply and Demand features are identified by ZIP_FILE:FEATURE_ID (see source_feature_ids).
+    Returns (detailed table indexed by the Supply ids, one-row summary of nearest distances).
+    """
+    columns = ['SOURCE', 'ZIP_FILE', 'FEATURE_ID']
+    gdf_supply = load_processed_layer("all_layers", processed_path, columns=columns, partitions={'SOURCE': 'Supply'})
+    gdf_demand = load_processed_layer("all_layers", processed_path, columns=columns, partitions={'SOURCE': 'Demand'})
+    if gdf_supply.empty or gdf_demand.empty:
+        return None, None
+
+    gdf_demand.index = source_feature_ids(gdf_demand)
+    demand_index = FacilityIndex.from_gdf(gdf_demand)
+    detailed = demand_index.proximity_table(point_coords(gdf_supply), k=k, radii_km=radii_km, label="demand",
+                                            index=pd.Index(source_feature_ids(gdf_supply), name='supply_id'))
+    # Keep the historical column names for the closest demand feature
+    detailed.insert(0, 'distance_km', detailed['nearest_demand_1_km'])
+    detailed.insert(0, 'nearest_demand_id', detailed['nearest_demand_1_id'])
+
+    summary = pd.DataFrame([{
+        'min_distance_km': detailed['distance_km'].min(),
+        'max_distance_km': detailed['distance_km'].max(),
+        'mean_distance_km': detailed['distance_km'].mean(),
+        'median_distance_km': detailed['distance_km'].median(),
+    }])
+    return detailed, summary
+
+def main(k=3, radii_km=(5, 10, 20)):
     """
     Processes research complex data and calculates distances.
+    - Top-k nearest complexes and complex counts within `radii_km` for each geocoded address.
+    - The same metrics from every Supply feature to the Demand features.
     """
     raw_path = "data/raw/04_research_complexes"
     processed_path = "data/processed"
     output_path = "output/reports"
     ensure_dir(output_path)
-    
+
     geocoded_addresses_file = os.path.join(processed_path, "geocoded_addresses_with_admin.gpkg")
-    
+
     if not os.path.isdir(raw_path):
         print(f"ERROR: Research complex data directory not found at '{raw_path}'.")
-        return
+        return 1
     if not os.path.exists(geocoded_addresses_file):
         print(f"ERROR: Geocoded addresses not found. Run script 03 first.")
-        return
+        return 1
 
-    # We re-use the processing function from script 01
-    from src.s01_geospatial_preprocessing import process_shapefiles_in_dir
-    gdf_complexes = process_shapefiles_in_dir(raw_path, "ResearchComplex")
-    
-    if gdf_complexes is None:
+    complex_index = load_complex_index(raw_path, os.path.join(processed_path, "research_complex_index.pkl"))
+    if complex_index is None:
         print("No research complexes were processed. Exiting.")
-        return
+        return 1
 
     gdf_addresses = gpd.read_file(geocoded_addresses_file)
-    gdf_addresses = gdf_addresses.to_crs(gdf_complexes.crs)
-    
-    gdf_joined = gpd.sjoin_nearest(gdf_addresses, gdf_complexes, distance_col="distance_to_complex")
-    
+    proximity = complex_index.proximity_table(point_coords(gdf_addresses), k=k, radii_km=radii_km,
+                                              label="complex", index=gdf_addresses.index)
+    proximity.insert(0, 'distance_to_complex', proximity['nearest_complex_1_km'] * 1000)
+    gdf_joined = gdf_addresses.join(proximity, rsuffix='_complex')
+
     output_file = os.path.join(output_path, "addresses_with_distance_to_complex.csv")
     gdf_joined.drop(columns='geometry').to_csv(output_file, index=False, encoding='utf-8-sig')
-    
+
     print(f"Analysis complete. Results saved to {output_file}")
 
+    detailed, summary = supply_demand_proximity(processed_path, k=k, radii_km=radii_km)
+    if detailed is not None:
+        detailed.to_csv(os.path.join(output_path, "proximity_analysis_detailed.csv"), encoding='utf-8-sig')
+        summary.to_csv(os.path.join(output_path, "proximity_analysis_summary.csv"), index=False, encoding='utf-8-sig')
+        print(f"Supply-demand proximity saved to {os.path.join(output_path, 'proximity_analysis_detailed.csv')}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    exit_code = main()
+    write_run_report("04")
+    sys.exit(exit_code)
@@ -1,37 +1,154 @@
 # src/05_paper_impact_analysis.py
 import pandas as pd
 import numpy as np
-from bertopic import BERTopic
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import MinMaxScaler
 import os
+import sys
+import json
+import hashlib
 from utils import ensure_dir
+from embedding_cache import EmbeddingCache, content_hash
+from table_io import read_table, write_table
+from profiling import profile_section, write_run_report
+from weight_learning import (build_feature_matrix, feature_cache_path, save_feature_matrix, load_feature_matrix,
+                             cv_feature_importances, importance_weights)
 
 class AdvancedPaperAnalyzer:
-    def __init__(self, file_path):
+    """
+    Topic modeling and impact scoring of the paper corpus.
+    `topic_mode` selects how topics are obtained when a saved model exists at `topic_model_path`:
+    - "refit": fit BERTopic on the whole corpus (the default and the fallback without a saved model).
+    - "assign": assign every document to the topics of the saved model.
+    - "merge": fit a model on the documents the saved model has not seen and merge it in.
+    Embeddings are cached in `cache_dir` so only new abstracts are encoded.
+    `encode_fn(list_of_texts)` replaces the sentence-transformers encoder (e.g. an offline
+    encoder for benchmarks); `embedding_model` then only names the embedding cache.
+    `file_path` may be Excel, Parquet, Feather or CSV; Excel input is converted once to
+    Parquet in `table_cache_dir` when given.
+    `weight_mode` selects how the impact weights are learned:
+    - "split": one GradientBoostingRegressor on an 80/20 split (feature_importances_).
+    - "cv": `cv_repeats` x `cv_splits`-fold CV of an early-stopped histogram booster, run on
+      `n_jobs` processes (all cores by default), with permutation importances averaged over
+      the folds. The feature matrix (with topic one-hots) is cached in `feature_cache_dir`
+      when given; see weight_features.
+    """
+    def __init__(self, file_path, cache_dir=None, embedding_model="all-MiniLM-L6-v2",
+                 topic_model_path=None, topic_mode="refit", embedding_batch_size=256, encode_fn=None,
+                 table_cache_dir=None, weight_mode="split", cv_splits=5, cv_repeats=3, n_jobs=None,
+                 feature_cache_dir=None):
         self.file_path = file_path
         self.df = None
         self.topic_model = None
         self.ml_model = None
+        self.embeddings = None
+        self.topics_over_time = None
+        self.cache_dir = cache_dir
+        self.embedding_model = embedding_model
+        self.topic_model_path = topic_model_path
+        self.topic_mode = topic_mode
+        self.embedding_batch_size = embedding_batch_size
+        self.encode_fn = encode_fn
+        self.table_cache_dir = table_cache_dir
+        self.weight_mode = weight_mode
+        self.cv_splits = cv_splits
+        self.cv_repeats = cv_repeats
+        self.n_jobs = n_jobs
+        self.feature_cache_dir = feature_cache_dir
+        self.weight_importances = None
+        self.cv_folds = None
+        self._encoder = None
 
     def load_and_preprocess(self):
-        self.df = pd.read_excel(self.file_path)
+        self.df = read_table(self.file_path, cache_dir=self.table_cache_dir)
         self.df.rename(columns={'영문 초록': 'abstract', 'KCI 피인용 횟수': 'citations'}, inplace=True)
         self.df['citations'] = pd.to_numeric(self.df['citations'], errors='coerce').fillna(0)
         self.df.dropna(subset=['abstract'], inplace=True)
         self.df['abstract'] = self.df['abstract'].astype(str)
         print(f"Loaded and preprocessed {len(self.df)} papers.")
 
+    def _encode(self, docs):
+        if self.encode_fn is not None:
+            return self.encode_fn(docs)
+        if self._encoder is None:
+            from sentence_transformers import SentenceTransformer
+            self._encoder = SentenceTransformer(self.embedding_model)
+        return self._encoder.encode(docs, batch_size=self.embedding_batch_size, show_progress_bar=False)
+
+    def embed_documents(self, docs):
+        """Embeddings for `docs`, encoding only abstracts missing from the cache."""
+        if self.cache_dir is None:
+            return np.asarray(self._encode(docs), dtype=np.float32)
+        cache = EmbeddingCache(self.cache_dir, self.embedding_model)
+        return cache.get_or_encode(docs, self._encode, batch_size=self.embedding_batch_size)
+
+    def _new_topic_model(self):
+        # BERTopic is only imported for topic modeling, so the other steps run without it
+        from bertopic import BERTopic
+        vectorizer_model = CountVectorizer(stop_words="english")
+        return BERTopic(embedding_model=self._topic_embedding_model(), vectorizer_model=vectorizer_model,
+                        verbose=True, min_topic_size=5)
+
+    def _topic_embedding_model(self):
+        # Documents are always passed with precomputed embeddings; a custom encoder has no BERTopic backend
+        return None if self.encode_fn is not None else self.embedding_model
+
+    def _seen_hashes_file(self):
+        return os.path.join(self.topic_model_path, "seen_documents.json")
+
+    def _load_saved_model(self):
+        """Returns (saved BERTopic model, set of document hashes it has seen) or (None, set())."""
+        if not self.topic_model_path or not os.path.exists(self._seen_hashes_file()):
+            return None, set()
+        with open(self._seen_hashes_file(), encoding='utf-8') as fh:
+            seen = set(json.load(fh))
+        from bertopic import BERTopic
+        return BERTopic.load(self.topic_model_path, embedding_model=self._topic_embedding_model()), seen
+
+    def _save_model(self, seen):
+        if not self.topic_model_path:
+            return
+        self.topic_model.save(self.topic_model_path, serialization="safetensors", save_ctfidf=True,
+                              save_embedding_model=self._topic_embedding_model() or False)
+        with open(self._seen_hashes_file(), 'w', encoding='utf-8') as fh:
+            json.dump(sorted(seen), fh)
+
     def perform_topic_modeling(self):
         docs = self.df['abstract'].tolist()
-        vectorizer_model = CountVectorizer(stop_words="english")
-        self.topic_model = BERTopic(vectorizer_model=vectorizer_model, verbose=True, min_topic_size=5)
-        topics, _ = self.topic_model.fit_transform(docs)
+        hashes = [content_hash(doc) for doc in docs]
+        with profile_section("embedding", rows=len(docs), model=self.embedding_model):
+            self.embeddings = self.embed_documents(docs)
+
+        saved_model, seen = (None, set()) if self.topic_mode == "refit" else self._load_saved_model()
+        with profile_section("topic_fit", rows=len(docs), mode=self.topic_mode if saved_model is not None else "refit"):
+            if saved_model is None:
+                self.topic_model = self._new_topic_model()
+                topics, _ = self.topic_model.fit_transform(docs, embeddings=self.embeddings)
+                self._save_model(set(hashes))
+            else:
+                self.topic_model = saved_model
+                new_idx = [i for i, h in enumerate(hashes) if h not in seen]
+                if self.topic_mode == "merge" and len(new_idx) >= 2 * self.topic_model.min_topic_size:
+                    new_model = self._new_topic_model()
+                    new_model.fit([docs[i] for i in new_idx], embeddings=self.embeddings[new_idx])
+                    self.topic_model = type(saved_model).merge_models([saved_model, new_model])
+                    print(f"Merged a model fitted on {len(new_idx)} new documents into the saved topic model.")
+                    self._save_model(seen | set(hashes))
+                topics, _ = self.topic_model.transform(docs, embeddings=self.embeddings)
         self.df['topic'] = topics
         print("Topic modeling complete.")
 
+    def compute_topics_over_time(self, nr_bins=None):
+        """Topic frequencies per publication year (논문발행연도), reusing the assigned topics."""
+        if '논문발행연도' not in self.df.columns:
+            return None
+        self.topics_over_time = self.topic_model.topics_over_time(
+            self.df['abstract'].tolist(), self.df['논문발행연도'].tolist(),
+            topics=self.df['topic'].tolist(), nr_bins=nr_bins)
+        return self.topics_over_time
+
     def calculate_indicators(self):
         self.df['author_count'] = self.df['저자'].str.split(';').str.len().fillna(1)
         self.df['abstract_length'] = self.df['abstract'].str.len()
@@ -39,16 +156,71 @@ class AdvancedPaperAnalyzer:
         print("Indicators calculated.")
 
     def optimize_weights_with_ml(self):
+        if self.weight_mode == "cv":
+            return self.optimize_weights_with_cv()
         features = ['author_count', 'abstract_length', 'year_norm']
         target = 'citations'
         X = self.df[features]
         y = np.log1p(self.df[target])
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         self.ml_model = GradientBoostingRegressor(n_estimators=100, random_state=42)
-        self.ml_model.fit(X_train, y_train)
+        with profile_section("gbr_fit", rows=len(X_train)):
+            self.ml_model.fit(X_train, y_train)
         print(f"ML model trained. R-squared on test set: {self.ml_model.score(X_test, y_test):.2f}")
         self.feature_weights = self.ml_model.feature_importances_
 
+    def _topic_model_fingerprint(self):
+        """Names, sizes and mtimes of the saved topic model files; None when topics are refitted."""
+        if self.topic_mode == "refit" or not self.topic_model_path or not os.path.isdir(self.topic_model_path):
+            return None
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(self.topic_model_path)):
+            stat = os.stat(os.path.join(self.topic_model_path, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()
+
+    def _feature_cache_path(self):
+        if not self.feature_cache_dir:
+            return None
+        # In assign/merge mode the topics also depend on the saved model, which changes between runs
+        return feature_cache_path(self.feature_cache_dir, self.file_path, embedding_model=self.embedding_model,
+                                  topic_mode=self.topic_mode, min_topic_size=5,
+                                  topic_model=self._topic_model_fingerprint())
+
+    def weight_features(self):
+        """
+        (X, y) of the weight-learning model. Before any preprocessing has run, a cached
+        matrix for the same paper table, topic configuration and (in assign/merge mode)
+        saved topic model is reused, so repeated weight experiments skip loading, topic
+        modeling and indicator construction.
+        Otherwise the matrix is built from the analysed papers and cached.
+        """
+        path = self._feature_cache_path()
+        if self.df is None or 'author_count' not in self.df.columns:
+            if path and os.path.exists(path):
+                print(f"Reusing cached feature matrix {path}")
+                return load_feature_matrix(path)
+            self.load_and_preprocess()
+            self.perform_topic_modeling()
+            self.calculate_indicators()
+            # A merge may have updated the saved model; key the matrix by the model it was built with
+            path = self._feature_cache_path()
+        X = build_feature_matrix(self.df)
+        if path:
+            save_feature_matrix(X, path)
+        return X.drop(columns='target'), X['target']
+
+    def optimize_weights_with_cv(self):
+        """Learns the impact weights by repeated k-fold CV; can be called on its own for weight experiments."""
+        X, y = self.weight_features()
+        n_folds = self.cv_splits * self.cv_repeats
+        with profile_section("gbr_cv_fit", rows=len(X), folds=n_folds, n_jobs=self.n_jobs):
+            self.weight_importances, self.cv_folds = cv_feature_importances(
+                X, y, n_splits=self.cv_splits, n_repeats=self.cv_repeats, n_jobs=self.n_jobs)
+        self.feature_weights = importance_weights(self.weight_importances)
+        print(f"CV weights from {n_folds} folds: held-out R-squared {self.cv_folds['r2'].mean():.2f} "
+              f"(+/- {self.cv_folds['r2'].std():.2f}), weights {np.round(self.feature_weights, 3).tolist()}")
+
     def calculate_final_impact_scores(self):
         features = ['author_count', 'abstract_length', 'year_norm']
         indicator_data = self.df[features].values
@@ -60,27 +232,58 @@ class AdvancedPaperAnalyzer:
     def run_analysis(self):
         self.load_and_preprocess()
         self.perform_topic_modeling()
+        self.compute_topics_over_time()
         self.calculate_indicators()
         self.optimize_weights_with_ml()
         self.calculate_final_impact_scores()
         return self.df
 
-def main():
+def main(topic_mode="refit", export_excel=False, weight_mode="split", n_jobs=None):
+    """
+    Runs the paper impact analysis.
+    `topic_mode` ("refit", "assign" or "merge") controls reuse of the saved topic model.
+    `weight_mode="cv"` learns the impact weights by repeated k-fold CV on `n_jobs` processes
+    and writes the fold-averaged importances to impact_weight_importances.csv.
+    Results are written as Parquet; `export_excel=True` also writes the xlsx copy.
+    """
     raw_path = "data/raw"
+    processed_path = "data/processed"
     output_path = "output/reports"
     ensure_dir(output_path)
 
     paper_file = os.path.join(raw_path, "academic_papers_list.xlsx")
     if not os.path.exists(paper_file):
         print(f"ERROR: Academic paper file not found at '{paper_file}'. Please provide it.")
-        return
+        return 1
 
-    analyzer = AdvancedPaperAnalyzer(paper_file)
+    analyzer = AdvancedPaperAnalyzer(paper_file,
+                                     cache_dir=os.path.join(processed_path, "embedding_cache"),
+                                     topic_model_path=os.path.join(processed_path, "topic_model"),
+                                     topic_mode=topic_mode,
+                                     table_cache_dir=os.path.join(processed_path, "table_cache"),
+                                     weight_mode=weight_mode, n_jobs=n_jobs,
+                                     feature_cache_dir=os.path.join(processed_path, "feature_cache"))
     results_df = analyzer.run_analysis()
     
-    output_file = os.path.join(output_path, "comprehensive_paper_analysis.xlsx")
-    results_df.to_excel(output_file, index=False)
+    if analyzer.topics_over_time is not None:
+        topics_file = os.path.join(output_path, "topics_over_time.csv")
+        analyzer.topics_over_time.to_csv(topics_file, index=False, encoding='utf-8-sig')
+        print(f"Topics over time saved to {topics_file}")
+
+    if analyzer.weight_importances is not None:
+        importances_file = os.path.join(output_path, "impact_weight_importances.csv")
+        analyzer.weight_importances.to_csv(importances_file, encoding='utf-8-sig')
+        print(f"CV importances saved to {importances_file}")
+    
+    output_file = os.path.join(output_path, "comprehensive_paper_analysis.parquet")
+    write_table(results_df, output_file)
     print(f"Paper impact analysis complete. Results saved to {output_file}")
+    if export_excel:
+        excel_file = os.path.join(output_path, "comprehensive_paper_analysis.xlsx")
+        results_df.to_excel(excel_file, index=False)
+        print(f"Excel copy saved to {excel_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    exit_code = main()
+    write_run_report("05")
+    sys.exit(exit_code)
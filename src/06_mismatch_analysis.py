@@ -1,15 +1,25 @@
 # src/06_mismatch_analysis.py
 import pandas as pd
-import geopandas as gpd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
-import matplotlib.pyplot as plt
 import os
+import sys
 from utils import ensure_dir
+from layer_store import load_processed_layer
+from spatial_autocorrelation import autocorrelation_report
+from profiling import profile_section, write_run_report
+from mismatch_scenarios import bootstrap_mismatch, region_codes
+from region_classifier import RegionClassifier
+from table_io import read_table, write_table
+from map_rendering import admin_for_figure, render_figures
 
-def main():
+def main(seed=42, n_bootstrap=2000, normalizations=("minmax", "rank"), gap_threshold=0.1, export_excel=False):
     """
     Integrates demand and supply indices to analyze the mismatch.
+    The mismatch table is written as Parquet; `export_excel=True` also writes the xlsx copy.
+    The random region assignment of papers is seeded by `seed`. `n_bootstrap` seeded
+    scenarios (paper resamples, region assignments and `normalizations`) give the
+    uncertainty of the Mismatch Index in mismatch_bootstrap_summary.csv.
     """
     reports_path = "output/reports"
     figures_path = "output/figures"
@@ -17,23 +27,34 @@ def main():
     ensure_dir(figures_path)
 
     demand_file = os.path.join(reports_path, "zeb_opportunity_index.csv")
-    supply_file = os.path.join(reports_path, "comprehensive_paper_analysis.xlsx")
+    supply_file = os.path.join(reports_path, "comprehensive_paper_analysis.parquet")
     admin_file = os.path.join(processed_path, "LSMD_CONT_ADMIN_ALL.gpkg")
 
     if not all(os.path.exists(f) for f in [demand_file, supply_file, admin_file]):
         print("ERROR: One or more required input files not found. Please run previous scripts first.")
-        return
+        return 1
 
     df_demand = pd.read_csv(demand_file)
-    df_supply_papers = pd.read_excel(supply_file)
-    gdf_admin = gpd.read_file(admin_file)
+    # Only the columns used for regionalization and the supply index are read
+    df_supply_papers = read_table(supply_file, columns=['SIDO_NM', 'Technology_Supply_Index', 'latitude', 'longitude'])
+    gdf_admin = load_processed_layer("admin_boundaries", processed_path, columns=['SIDO_NM'])
 
-    # For this example, we create a dummy 'SIDO_NM' column for papers.
-    # In a real project, you would geocode institution addresses to get this information.
-    if 'SIDO_NM' not in df_supply_papers.columns:
+    # Papers with geocoded institution coordinates are regionalized point-in-polygon.
+    # Otherwise, for this example, we create a dummy 'SIDO_NM' column for papers.
+    if {'latitude', 'longitude'} <= set(df_supply_papers.columns):
+        classifier = RegionClassifier(gdf_admin, columns=['SIDO_NM'])
+        with profile_section("region_assignment", rows=len(df_supply_papers)):
+            df_supply_papers = classifier.classify_frame(df_supply_papers, x_col='longitude', y_col='latitude',
+                                                         crs="EPSG:4326")
+        paper_regions = df_supply_papers['SIDO_NM'].astype(object)
+        print(f"Assigned {paper_regions.notna().sum()} of {len(df_supply_papers)} papers to regions from coordinates.")
+    elif 'SIDO_NM' not in df_supply_papers.columns:
         print("Warning: 'SIDO_NM' column not found in paper data. Assigning regions randomly for demonstration.")
         sido_list = df_demand['SIDO_NM'].unique()
-        df_supply_papers['SIDO_NM'] = np.random.choice(sido_list, size=len(df_supply_papers))
+        paper_regions = pd.Series(np.nan, index=df_supply_papers.index, dtype=object)
+        df_supply_papers['SIDO_NM'] = np.random.default_rng(seed).choice(sido_list, size=len(df_supply_papers))
+    else:
+        paper_regions = df_supply_papers['SIDO_NM']
 
     df_supply_agg = df_supply_papers.groupby('SIDO_NM')['Technology_Supply_Index'].mean().reset_index()
 
@@ -45,19 +66,48 @@ def main():
 
     df_mismatch['Mismatch_Index'] = df_mismatch['Demand_Normalized'] - df_mismatch['Supply_Normalized']
 
-    output_file = os.path.join(reports_path, "zeb_mismatch_analysis_results.xlsx")
-    df_mismatch.to_excel(output_file, index=False)
+    # One row per region: stage 02 repeats the regional index on every admin feature of a SIDO_NM
+    df_regions = df_mismatch.groupby('SIDO_NM', sort=False)[['ZEB_Opportunity_Index', 'Mismatch_Index']].first()
+
+    # Papers without a known region are re-assigned in every scenario rather than fixed once
+    with profile_section("mismatch_bootstrap", rows=len(df_supply_papers), samples=n_bootstrap):
+        scenarios, _ = bootstrap_mismatch(df_regions['ZEB_Opportunity_Index'].to_numpy(),
+                                          df_supply_papers['Technology_Supply_Index'].fillna(0).to_numpy(),
+                                          region_codes(paper_regions, df_regions.index),
+                                          n_samples=n_bootstrap, normalizations=normalizations,
+                                          gap_threshold=gap_threshold, seed=seed)
+    scenarios.insert(0, 'SIDO_NM', df_regions.index.to_numpy())
+    scenarios.insert(1, 'Mismatch_Index', df_regions['Mismatch_Index'].to_numpy())
+    bootstrap_csv = os.path.join(reports_path, "mismatch_bootstrap_summary.csv")
+    scenarios.to_csv(bootstrap_csv, index=False, encoding='utf-8-sig')
+    print(f"Bootstrap ({n_bootstrap} scenarios) of the Mismatch Index saved to {bootstrap_csv}")
+
+    output_file = os.path.join(reports_path, "zeb_mismatch_analysis_results.parquet")
+    write_table(df_mismatch, output_file)
     print(f"Mismatch analysis complete. Results saved to {output_file}")
+    if export_excel:
+        excel_file = os.path.join(reports_path, "zeb_mismatch_analysis_results.xlsx")
+        df_mismatch.to_excel(excel_file, index=False)
+        print(f"Excel copy saved to {excel_file}")
 
-    gdf_mismatch = gdf_admin.merge(df_mismatch, on='SIDO_NM')
-    fig, ax = plt.subplots(1, 1, figsize=(12, 12))
-    gdf_mismatch.plot(column='Mismatch_Index', cmap='RdBu_r', linewidth=0.8, ax=ax, edgecolor='0.8', legend=True,
-                      legend_kwds={'label': "Mismatch Index (Demand - Supply)", 'orientation': "horizontal"})
-    ax.set_title('Spatiotemporal Innovation Mismatch', fontdict={'fontsize': '16', 'fontweight': '3'})
-    ax.set_axis_off()
-    plt.savefig(os.path.join(figures_path, "mismatch_analysis_charts.png"), dpi=300)
-    print(f"Mismatch map saved to {os.path.join(figures_path, 'mismatch_analysis_charts.png')}")
-    plt.close()
+    gdf_mismatch = gdf_admin.merge(df_mismatch.drop_duplicates('SIDO_NM'), on='SIDO_NM')
+    
+    global_stats, lisa = autocorrelation_report(gdf_mismatch, ['Technology_Supply_Index', 'Mismatch_Index'])
+    global_stats.to_csv(os.path.join(reports_path, "spatial_autocorrelation_mismatch.csv"), index_label='id', encoding='utf-8-sig')
+    lisa.insert(0, 'SIDO_NM', gdf_mismatch['SIDO_NM'])
+    lisa.to_csv(os.path.join(reports_path, "lisa_mismatch.csv"), index=False, encoding='utf-8-sig')
+    print(f"Spatial autocorrelation of supply and mismatch saved to {reports_path}")
+    gdf_plot = admin_for_figure(gdf_admin, processed_path).merge(
+        df_mismatch[['SIDO_NM', 'Mismatch_Index']].drop_duplicates('SIDO_NM'), on='SIDO_NM')
+    with profile_section("map_rendering", rows=len(gdf_plot), figure="mismatch_analysis_charts.png"):
+        figure_file, = render_figures([{
+            "path": os.path.join(figures_path, "mismatch_analysis_charts.png"), "gdf": gdf_plot,
+            "column": 'Mismatch_Index', "cmap": 'RdBu_r', "title": 'Spatiotemporal Innovation Mismatch',
+            "legend_kwds": {'label': "Mismatch Index (Demand - Supply)", 'orientation': "horizontal"},
+            "north_arrow": False, "scale_bar": False}])
+    print(f"Mismatch map saved to {figure_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    exit_code = main()
+    write_run_report("06")
+    sys.exit(exit_code)
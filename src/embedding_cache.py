@@ -0,0 +1,87 @@
+# src/embedding_cache.py
+import os
+import json
+import contextlib
+import hashlib
+import numpy as np
+
+KEY_LINE_BYTES = 65  # sha256 hex digest plus newline
+
+def content_hash(text):
+    """SHA-256 of a document's text, the key of its cached embedding."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """
+    Append-only, memory-mapped store of document embeddings for one model.
+    - `embeddings.f32` holds the float32 rows, `keys.txt` the content hash of each row.
+    - Only documents whose hash is not yet stored are encoded, in batches.
+    """
+    def __init__(self, directory, model_name):
+        self.directory = directory
+        self.model_name = model_name
+        self.data_file = os.path.join(directory, "embeddings.f32")
+        self.keys_file = os.path.join(directory, "keys.txt")
+        self.meta_file = os.path.join(directory, "meta.json")
+        os.makedirs(directory, exist_ok=True)
+
+        self.dim = None
+        self.rows = {}
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file, encoding='utf-8') as fh:
+                meta = json.load(fh)
+            if meta["model_name"] == model_name:
+                self.dim = meta["dim"]
+                with open(self.keys_file, encoding='utf-8') as fh:
+                    keys = fh.read().split()
+                # Rows written after the last completed append are ignored
+                keys = keys[:meta["count"]]
+                self.rows = {key: i for i, key in enumerate(keys)}
+            else:
+                print(f"Embedding cache built with '{meta['model_name']}'; starting a new one for '{model_name}'.")
+                for path in (self.data_file, self.keys_file, self.meta_file):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _matrix(self):
+        return np.memmap(self.data_file, dtype=np.float32, mode='r', shape=(len(self.rows), self.dim))
+
+    def _append(self, keys, embeddings):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        # Truncate any partial write left by an interrupted run before appending
+        with open(self.data_file, 'ab') as fh:
+            fh.truncate(len(self.rows) * self.dim * 4)
+            fh.write(embeddings.tobytes())
+        with open(self.keys_file, 'ab') as fh:
+            fh.truncate(len(self.rows) * KEY_LINE_BYTES)
+            fh.write("".join(f"{key}\n" for key in keys).encode('ascii'))
+        for key in keys:
+            self.rows[key] = len(self.rows)
+        with open(self.meta_file, 'w', encoding='utf-8') as fh:
+            json.dump({"model_name": self.model_name, "dim": self.dim, "count": len(self.rows)}, fh)
+
+    def get_or_encode(self, docs, encode, batch_size=256):
+        """
+        Returns an (n_docs, dim) float32 array of embeddings for `docs`.
+        `encode(list_of_texts)` is only called for documents not yet cached.
+        """
+        keys = [content_hash(doc) for doc in docs]
+        missing = {}
+        for key, doc in zip(keys, docs):
+            if key not in self.rows and key not in missing:
+                missing[key] = doc
+        print(f"Embeddings: {len(set(keys)) - len(missing)} cached, {len(missing)} to encode.")
+
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), batch_size):
+            batch = missing_keys[start:start + batch_size]
+            self._append(batch, encode([missing[k] for k in batch]))
+
+        if not keys:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.asarray(self._matrix()[[self.rows[k] for k in keys]])
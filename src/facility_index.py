@@ -0,0 +1,103 @@
+# src/facility_index.py
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+DEFAULT_RADII_KM = (5, 10, 20)
+
+def point_coords(gdf, target_crs="EPSG:5179"):
+    """(n, 2) array of point (or polygon centroid) coordinates in the metric target CRS."""
+    if gdf.crs is not None and gdf.crs.to_epsg() != 5179:
+        gdf = gdf.to_crs(target_crs)
+    geoms = gdf.geometry
+    if not (geoms.geom_type == 'Point').all():
+        geoms = geoms.centroid
+    return np.column_stack([geoms.x.to_numpy(), geoms.y.to_numpy()])
+
+def source_feature_ids(gdf, source_col='ZIP_FILE', feature_col='FEATURE_ID'):
+    """
+    Stable facility ids "<source file>:<feature number within that file>", unaffected
+    by other source files being added, removed or read in a different order, or by
+    the rows being re-sorted (the feature number is `feature_col`, written at ingestion;
+    without it the current row order within each source file is used).
+    """
+    sources = gdf[source_col].astype(str)
+    features = sources.groupby(sources, sort=False).cumcount()
+    if feature_col in gdf.columns:
+        features = gdf[feature_col].fillna(features)
+    return (sources + ":" + features.astype('int64').astype(str)).to_numpy()
+
+class FacilityIndex:
+    """
+    Persistable k-d tree over facility centroids in EPSG:5179 (metres).
+    Supports batched k-nearest and radius-count queries over large point sets.
+    `ids` labels each facility, `attributes` optionally keeps its attribute table
+    and `fingerprint` identifies the data it was built from.
+    """
+    def __init__(self, coords, ids, attributes=None, fingerprint=None):
+        self.coords = np.asarray(coords, dtype=float)
+        self.ids = np.asarray(ids)
+        self.attributes = attributes
+        self.fingerprint = fingerprint
+        self.tree = cKDTree(self.coords)
+
+    @classmethod
+    def from_gdf(cls, gdf, id_col=None, keep_attributes=False, fingerprint=None):
+        ids = gdf[id_col].to_numpy() if id_col else gdf.index.to_numpy()
+        attributes = pd.DataFrame(gdf.drop(columns=gdf.geometry.name)).reset_index(drop=True) if keep_attributes else None
+        return cls(point_coords(gdf), ids, attributes=attributes, fingerprint=fingerprint)
+
+    def save(self, path):
+        with open(path, 'wb') as fh:
+            pickle.dump(self, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path, fingerprint=None):
+        """Loads a saved index; returns None if missing or built from other data."""
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as fh:
+            index = pickle.load(fh)
+        if fingerprint is not None and index.fingerprint != fingerprint:
+            return None
+        return index
+
+    def nearest(self, coords, k=1, chunk_size=200000):
+        """Distances (m) and positional indices of the k nearest facilities, each (n, k)."""
+        k = min(k, len(self.coords))
+        distances = np.empty((len(coords), k))
+        indices = np.empty((len(coords), k), dtype=np.int64)
+        for start in range(0, len(coords), chunk_size):
+            d, i = self.tree.query(coords[start:start + chunk_size], k=k, workers=-1)
+            distances[start:start + chunk_size] = d.reshape(-1, k)
+            indices[start:start + chunk_size] = i.reshape(-1, k)
+        return distances, indices
+
+    def count_within(self, coords, radii_m, chunk_size=200000):
+        """{radius: (n,) count of facilities within that radius (m)}."""
+        counts = {r: np.empty(len(coords), dtype=np.int64) for r in radii_m}
+        for start in range(0, len(coords), chunk_size):
+            chunk = coords[start:start + chunk_size]
+            for r in radii_m:
+                counts[r][start:start + chunk_size] = self.tree.query_ball_point(chunk, r, return_length=True, workers=-1)
+        return counts
+
+    def proximity_table(self, coords, k=3, radii_km=DEFAULT_RADII_KM, label="complex", index=None):
+        """
+        One row per query point with the ids and distances (km) of the k nearest
+        facilities and the number of facilities within each radius, followed by the
+        attributes of the nearest facility when the index keeps them.
+        """
+        distances, indices = self.nearest(coords, k=k)
+        table = pd.DataFrame(index=index if index is not None else pd.RangeIndex(len(coords)))
+        for j in range(distances.shape[1]):
+            table[f"nearest_{label}_{j + 1}_id"] = self.ids[indices[:, j]]
+            table[f"nearest_{label}_{j + 1}_km"] = distances[:, j] / 1000
+        for r, counts in self.count_within(coords, [r * 1000 for r in radii_km]).items():
+            table[f"{label}_count_within_{r / 1000:g}km"] = counts
+        if self.attributes is not None:
+            nearest_attrs = self.attributes.iloc[indices[:, 0]].set_axis(table.index)
+            table = table.join(nearest_attrs, rsuffix=f"_{label}")
+        return table
@@ -0,0 +1,207 @@
+# src/geocoding.py
+import re
+import time
+import asyncio
+import sqlite3
+import unicodedata
+import pandas as pd
+
+# Short forms of the 17 SIDO names that appear at the start of free-text addresses
+SIDO_ALIASES = {
+    "서울": "서울특별시", "서울시": "서울특별시",
+    "부산": "부산광역시", "부산시": "부산광역시",
+    "대구": "대구광역시", "대구시": "대구광역시",
+    "인천": "인천광역시", "인천시": "인천광역시",
+    "광주": "광주광역시", "광주시": "광주광역시",
+    "대전": "대전광역시", "대전시": "대전광역시",
+    "울산": "울산광역시", "울산시": "울산광역시",
+    "세종": "세종특별자치시", "세종시": "세종특별자치시",
+    "경기": "경기도", "강원": "강원특별자치도", "강원도": "강원특별자치도",
+    "충북": "충청북도", "충남": "충청남도",
+    "전북": "전북특별자치도", "전라북도": "전북특별자치도", "전남": "전라남도",
+    "경북": "경상북도", "경남": "경상남도",
+    "제주": "제주특별자치도", "제주도": "제주특별자치도",
+}
+
+def normalize_address(address):
+    """
+    Builds the cache key of a Korean address.
+    - NFKC-normalizes full-width characters and collapses whitespace.
+    - Drops parenthesized reference items, e.g. '(태평로1가)', and stray punctuation.
+    - Expands abbreviated SIDO names ('서울시' -> '서울특별시').
+    """
+    if address is None or (isinstance(address, float) and pd.isna(address)):
+        return ""
+    text = unicodedata.normalize("NFKC", str(address))
+    text = re.sub(r"\([^)]*\)", " ", text)
+    text = re.sub(r"[,·]", " ", text)
+    tokens = text.split()
+    if tokens:
+        tokens[0] = SIDO_ALIASES.get(tokens[0], tokens[0])
+    return " ".join(tokens)
+
+class GeocodeCache:
+    """
+    On-disk SQLite cache of geocoding results keyed by normalized address.
+    Misses are cached too (found = 0) and expire after `negative_ttl` seconds,
+    hits after `ttl` seconds (None = never).
+    """
+    def __init__(self, path, ttl=365 * 24 * 3600, negative_ttl=30 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS geocode (
+                                key TEXT PRIMARY KEY, provider TEXT, found INTEGER,
+                                latitude REAL, longitude REAL, created_at REAL)""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def get_many(self, keys):
+        """Returns {key: (latitude, longitude) or None} for the keys with a live entry."""
+        now = time.time()
+        found = {}
+        conn = self._connect()
+        try:
+            keys = list(keys)
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(f"SELECT key, found, latitude, longitude, created_at FROM geocode "
+                                    f"WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                for key, hit, lat, lon, created_at in rows:
+                    ttl = self.ttl if hit else self.negative_ttl
+                    if ttl is None or now - created_at <= ttl:
+                        found[key] = (lat, lon) if hit else None
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, results):
+        """Stores {key: (provider, (latitude, longitude) or None)}."""
+        now = time.time()
+        rows = [(key, provider, int(point is not None), *(point or (None, None)), now)
+                for key, (provider, point) in results.items()]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?)", rows)
+        finally:
+            conn.close()
+
+class AsyncRateLimiter:
+    """Spaces request starts at least `min_delay_seconds` apart."""
+    def __init__(self, min_delay_seconds):
+        self.min_delay_seconds = min_delay_seconds
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_delay_seconds
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class GeopyProvider:
+    """
+    Wraps any geopy geocoder (Nominatim, a self-hosted Nominatim stand-in, ...).
+    Blocking geopy calls run in worker threads, spaced by the provider's rate limit.
+    """
+    def __init__(self, geocoder, name=None, min_delay_seconds=1.0, max_concurrency=1):
+        self.geocoder = geocoder
+        self.name = name or type(geocoder).__name__
+        self.min_delay_seconds = min_delay_seconds
+        self.max_concurrency = max_concurrency
+
+    async def geocode(self, address):
+        location = await asyncio.to_thread(self.geocoder.geocode, address)
+        return (location.latitude, location.longitude) if location else None
+
+class GazetteerProvider:
+    """
+    Offline provider backed by a table of known addresses
+    (columns: address, latitude, longitude), matched on the normalized key.
+    """
+    def __init__(self, gazetteer, name="gazetteer"):
+        if isinstance(gazetteer, str):
+            gazetteer = pd.read_csv(gazetteer)
+        keys = gazetteer['address'].map(normalize_address)
+        self.lookup = dict(zip(keys, zip(gazetteer['latitude'], gazetteer['longitude'])))
+        self.name = name
+        self.min_delay_seconds = 0.0
+        self.max_concurrency = 64
+
+    async def geocode(self, address):
+        return self.lookup.get(normalize_address(address))
+
+class BatchGeocoder:
+    """
+    Deduplicating, cached geocoder over an ordered chain of providers.
+    - Addresses are collapsed to unique normalized keys before dispatch.
+    - Cached keys (hits and misses) are answered without any provider call.
+    - Remaining keys are sent concurrently to each provider within its rate limit;
+      keys a provider cannot resolve fall through to the next one.
+    """
+    def __init__(self, providers, cache=None):
+        self.providers = list(providers)
+        self.cache = cache
+        self.request_count = 0
+
+    async def _resolve_with(self, provider, keys, originals):
+        limiter = AsyncRateLimiter(provider.min_delay_seconds)
+        semaphore = asyncio.Semaphore(provider.max_concurrency)
+
+        async def one(key):
+            async with semaphore:
+                await limiter.wait()
+                self.request_count += 1
+                try:
+                    return key, await provider.geocode(originals[key]), False
+                except Exception as e:
+                    print(f"  - {provider.name} failed for '{originals[key]}': {e}")
+                    return key, None, True
+
+        return await asyncio.gather(*(one(k) for k in keys))
+
+    async def _resolve(self, keys, originals):
+        """Returns ({key: (provider, point or None)}, keys that errored and must not be negative-cached)."""
+        results, errored, pending = {}, set(), list(keys)
+        for provider in self.providers:
+            if not pending:
+                break
+            for key, point, failed in await self._resolve_with(provider, pending, originals):
+                if point is not None:
+                    results[key] = (provider.name, point)
+                elif failed:
+                    errored.add(key)
+            pending = [k for k in pending if k not in results]
+        results.update({k: (None, None) for k in pending})
+        return results, {k for k in errored if results[k][1] is None}
+
+    def geocode_series(self, addresses):
+        """
+        Geocodes a Series of addresses.
+        Returns a DataFrame with `latitude` and `longitude` (NaN where not found), aligned with the input.
+        """
+        keys = addresses.map(normalize_address)
+        originals = dict(zip(keys, addresses.astype(str)))
+        unique_keys = [k for k in pd.unique(keys) if k]
+
+        cached = self.cache.get_many(unique_keys) if self.cache else {}
+        missing = [k for k in unique_keys if k not in cached]
+        print(f"Geocoding {len(addresses)} addresses: {len(unique_keys)} unique, "
+              f"{len(unique_keys) - len(missing)} cached, {len(missing)} to request.")
+
+        if missing:
+            resolved, errored = asyncio.run(self._resolve(missing, originals))
+            if self.cache:
+                self.cache.put_many({k: v for k, v in resolved.items() if k not in errored})
+            cached.update({k: point for k, (_, point) in resolved.items()})
+
+        points = keys.map(lambda k: cached.get(k))
+        return pd.DataFrame({
+            'latitude': points.map(lambda p: p[0] if p else float('nan')),
+            'longitude': points.map(lambda p: p[1] if p else float('nan')),
+        }, index=addresses.index)
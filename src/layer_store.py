@@ -0,0 +1,221 @@
+# src/layer_store.py
+import os
+import json
+import shutil
+import geopandas as gpd
+import pandas as pd
+import pyogrio
+import pyarrow.parquet as pq
+import shapely
+
+# Processed layers shared by the analysis stages: GeoPackage written by script 01
+# and the partitioned GeoParquet store written next to it.
+PROCESSED_LAYERS = {
+    "all_layers": "LSMD_CONT_ALL",
+    "admin_boundaries": "LSMD_CONT_ADMIN_ALL",
+}
+STORE_META_FILE = "_store.json"
+# Layers returned in a fixed attribute order by both backends (the Parquet store is
+# partitioned, the GeoPackage keeps insertion order)
+LAYER_ROW_ORDER = {"admin_boundaries": "SIDO_NM"}
+
+def store_path_for(processed_path, layer):
+    """Directory of the GeoParquet store for one processed layer."""
+    return os.path.join(processed_path, f"{PROCESSED_LAYERS[layer]}.parquet")
+
+def _partition_dir(store_path, keys):
+    return os.path.join(store_path, *(f"{col}={value}" for col, value in keys))
+
+def read_store_meta(store_path):
+    meta_file = os.path.join(store_path, STORE_META_FILE)
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file, encoding='utf-8') as fh:
+        return json.load(fh)
+
+def write_layer_store(gdf, store_path, partition_cols=("SOURCE",), row_group_size=50000, replace="all",
+                      spatial_sort=True):
+    """
+    Writes a GeoDataFrame as a hive-partitioned GeoParquet store.
+    - One directory level per partition column (e.g. SOURCE=Supply/SIDO_NM=...).
+    - Rows are Hilbert-sorted within each partition so that row groups are compact
+      and their bounding-box statistics (GeoParquet bbox covering) prune well;
+      `spatial_sort=False` keeps the input order (small layers read whole).
+    `replace="all"` rebuilds the store; `replace="partitions"` only rewrites the
+    top-level partitions present in `gdf` and keeps the others.
+    """
+    partition_cols = list(partition_cols)
+    meta = read_store_meta(store_path)
+    if replace == "all" or meta is None or meta["partition_cols"] != partition_cols:
+        if os.path.isdir(store_path):
+            shutil.rmtree(store_path)
+    os.makedirs(store_path, exist_ok=True)
+
+    if partition_cols:
+        for value in gdf[partition_cols[0]].dropna().unique():
+            top_dir = _partition_dir(store_path, [(partition_cols[0], value)])
+            if os.path.isdir(top_dir):
+                shutil.rmtree(top_dir)
+        groups = gdf.groupby(partition_cols, sort=True, dropna=False)
+    else:
+        groups = [((), gdf)]
+
+    for keys, part in groups:
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        part_dir = _partition_dir(store_path, zip(partition_cols, keys))
+        os.makedirs(part_dir, exist_ok=True)
+        if spatial_sort and len(part) > 1:
+            part = part.iloc[part.hilbert_distance().argsort()]
+        part.to_parquet(os.path.join(part_dir, "part-0.parquet"), index=False,
+                        write_covering_bbox=True, row_group_size=row_group_size)
+
+    with open(os.path.join(store_path, STORE_META_FILE), 'w', encoding='utf-8') as fh:
+        json.dump({"partition_cols": partition_cols, "crs": gdf.crs.to_string() if gdf.crs else None},
+                  fh, ensure_ascii=False)
+
+def drop_store_partitions(store_path, partition_col, values):
+    """Removes top-level partitions (e.g. a SOURCE whose zips all disappeared)."""
+    for value in values:
+        top_dir = _partition_dir(store_path, [(partition_col, value)])
+        if os.path.isdir(top_dir):
+            shutil.rmtree(top_dir)
+
+def _selected_files(store_path, partition_cols, partitions):
+    """Walks the partition tree, descending only into the requested values."""
+    dirs = [store_path]
+    for col in partition_cols:
+        wanted = partitions.get(col)
+        next_dirs = []
+        for d in dirs:
+            for name in sorted(os.listdir(d)):
+                prefix, _, value = name.partition("=")
+                if prefix == col and (wanted is None or value in wanted):
+                    next_dirs.append(os.path.join(d, name))
+        dirs = next_dirs
+    return [os.path.join(d, f) for d in dirs for f in sorted(os.listdir(d)) if f.endswith(".parquet")]
+
+def read_layer_store(store_path, columns=None, partitions=None, bbox=None):
+    """
+    Reads a GeoParquet store written by write_layer_store.
+    - `columns`: attribute columns to load (geometry is always included).
+    - `partitions`: {partition column: value or list of values} to restrict the files read.
+    - `bbox`: (minx, miny, maxx, maxy) in the store CRS; row groups outside it are skipped.
+    """
+    meta = read_store_meta(store_path)
+    partitions = {col: {str(v) for v in ([values] if isinstance(values, str) else values)}
+                  for col, values in (partitions or {}).items()}
+    files = _selected_files(store_path, meta["partition_cols"], partitions)
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ["geometry"]))
+
+    parts = [gpd.read_parquet(f, columns=read_columns, bbox=bbox) for f in files]
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        empty = {c: pd.Series(dtype=object) for c in (read_columns or [])}
+        return gpd.GeoDataFrame(empty, geometry=gpd.GeoSeries([], crs=meta["crs"]), crs=meta["crs"])
+    gdf = pd.concat(parts, ignore_index=True)
+    return gdf.drop(columns="bbox", errors="ignore")
+
+def _partition_where(partitions):
+    """SQL filter equivalent to a {column: values} partition selection."""
+    if not partitions:
+        return None
+    clauses = []
+    for col, values in partitions.items():
+        values = [values] if isinstance(values, str) else list(values)
+        quoted = ", ".join("'" + str(v).replace("'", "''") + "'" for v in values)
+        clauses.append(f'"{col}" IN ({quoted})')
+    return " AND ".join(clauses)
+
+def _batch_to_gdf(batch, geometry_col, crs):
+    df = batch.to_pandas()
+    geoms = shapely.from_wkb(df.pop(geometry_col).to_numpy())
+    return gpd.GeoDataFrame(df, geometry=geoms, crs=crs)
+
+def _row_group_outside(metadata, row_group, bbox):
+    """True when the bbox covering statistics show the row group lies outside `bbox`."""
+    stats = {}
+    group = metadata.row_group(row_group)
+    for i in range(group.num_columns):
+        column = group.column(i)
+        if column.path_in_schema.startswith("bbox.") and column.statistics is not None and column.statistics.has_min_max:
+            stats[column.path_in_schema[5:]] = (column.statistics.min, column.statistics.max)
+    if len(stats) < 4:
+        return False
+    minx, miny, maxx, maxy = bbox
+    return stats["xmin"][0] > maxx or stats["ymin"][0] > maxy or stats["xmax"][1] < minx or stats["ymax"][1] < miny
+
+def iter_layer_store(store_path, columns=None, partitions=None, bbox=None, chunk_size=100000):
+    """
+    Streams a GeoParquet store in GeoDataFrame chunks of at most `chunk_size` rows,
+    in the same row order as read_layer_store. Row groups outside `bbox` are skipped
+    from their statistics and the remaining rows are filtered on the bbox covering column.
+    """
+    meta = read_store_meta(store_path)
+    partitions = {col: {str(v) for v in ([values] if isinstance(values, str) else values)}
+                  for col, values in (partitions or {}).items()}
+    for path in _selected_files(store_path, meta["partition_cols"], partitions):
+        parquet_file = pq.ParquetFile(path)
+        names = parquet_file.schema_arrow.names
+        read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ["geometry"]))
+        if read_columns is not None and bbox is not None and "bbox" in names:
+            read_columns.append("bbox")
+        for row_group in range(parquet_file.num_row_groups):
+            if bbox is not None and _row_group_outside(parquet_file.metadata, row_group, bbox):
+                continue
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=[row_group], columns=read_columns):
+                gdf = _batch_to_gdf(batch, "geometry", meta["crs"])
+                if "bbox" in gdf.columns:
+                    if bbox is not None:
+                        box = pd.DataFrame(gdf["bbox"].tolist(), index=gdf.index)
+                        gdf = gdf[(box["xmin"] <= bbox[2]) & (box["xmax"] >= bbox[0])
+                                  & (box["ymin"] <= bbox[3]) & (box["ymax"] >= bbox[1])]
+                    gdf = gdf.drop(columns="bbox")
+                if len(gdf):
+                    yield gdf.reset_index(drop=True)
+
+def iter_processed_layer(layer, processed_path="data/processed", columns=None, partitions=None, bbox=None,
+                         chunk_size=100000):
+    """
+    Chunked counterpart of load_processed_layer that never holds more than `chunk_size`
+    features. The GeoPackage fallback streams through GDAL's Arrow interface with the
+    bbox served by the GeoPackage R-tree.
+    """
+    store_path = store_path_for(processed_path, layer)
+    if read_store_meta(store_path) is not None:
+        yield from iter_layer_store(store_path, columns=columns, partitions=partitions, bbox=bbox,
+                                    chunk_size=chunk_size)
+        return
+
+    gpkg_path = os.path.join(processed_path, f"{PROCESSED_LAYERS[layer]}.gpkg")
+    with pyogrio.open_arrow(gpkg_path, columns=columns, where=_partition_where(partitions),
+                            bbox=tuple(bbox) if bbox is not None else None, batch_size=chunk_size,
+                            use_pyarrow=True) as (meta, reader):
+        geometry_col = meta["geometry_name"] or "wkb_geometry"
+        for batch in reader:
+            if batch.num_rows:
+                yield _batch_to_gdf(batch, geometry_col, meta["crs"])
+
+def load_processed_layer(layer, processed_path="data/processed", columns=None, partitions=None, bbox=None):
+    """
+    Shared loader for the processed layers of script 01.
+    Reads the GeoParquet store when present, otherwise falls back to the GeoPackage
+    with the same column, partition (as a SQL filter) and bbox restrictions.
+    Layers in LAYER_ROW_ORDER come back sorted by that column whichever backend is read.
+    """
+    order_col = LAYER_ROW_ORDER.get(layer)
+    read_columns = columns
+    if order_col and columns is not None and order_col not in columns:
+        read_columns = list(columns) + [order_col]
+
+    store_path = store_path_for(processed_path, layer)
+    if read_store_meta(store_path) is not None:
+        gdf = read_layer_store(store_path, columns=read_columns, partitions=partitions, bbox=bbox)
+    else:
+        gpkg_path = os.path.join(processed_path, f"{PROCESSED_LAYERS[layer]}.gpkg")
+        gdf = gpd.read_file(gpkg_path, columns=read_columns, bbox=tuple(bbox) if bbox is not None else None,
+                            where=_partition_where(partitions))
+    if order_col and order_col in gdf.columns:
+        gdf = gdf.sort_values(order_col, kind='stable', ignore_index=True)
+        if read_columns is not columns:
+            gdf = gdf.drop(columns=order_col)
+    return gdf
@@ -0,0 +1,126 @@
+# src/map_rendering.py
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import geopandas as gpd
+import shapely
+import matplotlib.pyplot as plt
+from utils import add_north_arrow, add_scale_bar
+from layer_store import PROCESSED_LAYERS
+
+FIGURE_DPI = 300
+FIGURE_SIZE = (12, 12)
+SIMPLIFY_LEVELS = (25, 50, 100, 250, 1000)  # tolerances in metres (EPSG:5179)
+SIMPLIFIED_DIR = "simplified_admin"
+
+def _admin_digest(gpkg_path, cache_dir):
+    """sha256 of the admin GeoPackage, recomputed only when its size or modification time changes."""
+    stat = os.stat(gpkg_path)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    digest_file = os.path.join(cache_dir, "source.json")
+    if os.path.exists(digest_file):
+        with open(digest_file, encoding='utf-8') as fh:
+            cached = json.load(fh)
+        if {k: cached.get(k) for k in signature} == signature:
+            return cached["sha256"]
+    sha = hashlib.sha256()
+    with open(gpkg_path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            sha.update(block)
+    with open(digest_file, 'w', encoding='utf-8') as fh:
+        json.dump({**signature, "sha256": sha.hexdigest()}, fh)
+    return sha.hexdigest()
+
+def simplify_coverage(geoms, tolerance):
+    """
+    Simplifies polygons that tile the country without opening gaps or overlaps along
+    shared borders (coverage simplification). Inputs that are not a valid coverage
+    fall back to per-polygon topology-preserving simplification.
+    """
+    try:
+        return shapely.coverage_simplify(geoms, tolerance)
+    except Exception:
+        return shapely.simplify(geoms, tolerance, preserve_topology=True)
+
+def simplified_level_path(processed_path, tolerance, region_col='SIDO_NM', levels=SIMPLIFY_LEVELS):
+    """
+    GeoParquet file of the admin boundaries simplified at `tolerance` metres, in
+    <processed_path>/simplified_admin/. All `levels` are built at once from
+    LSMD_CONT_ADMIN_ALL.gpkg and reused until the GeoPackage hash changes.
+    """
+    cache_dir = os.path.join(processed_path, SIMPLIFIED_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    gpkg_path = os.path.join(processed_path, f"{PROCESSED_LAYERS['admin_boundaries']}.gpkg")
+    digest = _admin_digest(gpkg_path, cache_dir)[:16]
+    path = os.path.join(cache_dir, f"{digest}_{tolerance:g}m.parquet")
+    if os.path.exists(path):
+        return path
+
+    print(f"Building simplified admin boundaries at {', '.join(f'{t:g}' for t in levels)} m...")
+    gdf_admin = gpd.read_file(gpkg_path, columns=[region_col])
+    for name in os.listdir(cache_dir):
+        if name.endswith(".parquet") and not name.startswith(digest):
+            os.remove(os.path.join(cache_dir, name))
+    geoms = gdf_admin.geometry.to_numpy()
+    for level in sorted(set(levels) | {tolerance}):
+        gdf_admin.set_geometry(simplify_coverage(geoms, level), crs=gdf_admin.crs).to_parquet(
+            os.path.join(cache_dir, f"{digest}_{level:g}m.parquet"))
+    return path
+
+def choose_tolerance(bounds, dpi=FIGURE_DPI, figsize=FIGURE_SIZE, levels=SIMPLIFY_LEVELS, max_pixel_fraction=0.5):
+    """
+    Coarsest level whose tolerance stays below `max_pixel_fraction` of one output pixel
+    for a map of `bounds` drawn at `dpi` on `figsize` inches (equal aspect).
+    None when even the finest level would be visible (full resolution).
+    """
+    minx, miny, maxx, maxy = bounds
+    pixel = max((maxx - minx) / figsize[0], (maxy - miny) / figsize[1]) / dpi
+    usable = [level for level in levels if level <= pixel * max_pixel_fraction]
+    return max(usable) if usable else None
+
+def admin_for_figure(gdf_admin, processed_path="data/processed", dpi=FIGURE_DPI, figsize=FIGURE_SIZE,
+                     region_col='SIDO_NM'):
+    """
+    Admin boundaries (`region_col` and geometry) at the simplification level suited
+    to the output resolution; `gdf_admin` itself when full resolution is needed.
+    """
+    tolerance = choose_tolerance(gdf_admin.total_bounds, dpi=dpi, figsize=figsize)
+    gpkg_path = os.path.join(processed_path, f"{PROCESSED_LAYERS['admin_boundaries']}.gpkg")
+    if tolerance is None or not os.path.exists(gpkg_path):
+        return gdf_admin[[region_col, 'geometry']]
+    return gpd.read_parquet(simplified_level_path(processed_path, tolerance, region_col=region_col))
+
+def render_figure(job):
+    """
+    Renders one map figure described by a dict:
+    - "path", "title", and optionally "dpi", "figsize", "north_arrow", "scale_bar";
+    - a choropleth: "gdf" and "column" (with "cmap", "legend_kwds", "linewidth", "edgecolor"), or
+    - a raster surface: "surface" (.npy path), "extent" and "boundary" (GeoDataFrame drawn on top).
+    """
+    fig, ax = plt.subplots(1, 1, figsize=job.get("figsize", FIGURE_SIZE))
+    if "surface" in job:
+        image = ax.imshow(np.load(job["surface"], mmap_mode='r'), extent=job["extent"], cmap=job.get("cmap", 'viridis'),
+                          interpolation='nearest')
+        job["boundary"].boundary.plot(ax=ax, linewidth=0.5, color='0.6')
+        fig.colorbar(image, ax=ax, shrink=0.6)
+    else:
+        job["gdf"].plot(column=job["column"], cmap=job.get("cmap", 'viridis'), linewidth=job.get("linewidth", 0.8),
+                        ax=ax, edgecolor=job.get("edgecolor", '0.8'), legend=True, legend_kwds=job.get("legend_kwds"))
+    ax.set_title(job["title"], fontdict={'fontsize': '16', 'fontweight': '3'})
+    ax.set_axis_off()
+    if job.get("north_arrow", True):
+        add_north_arrow(ax)
+    if job.get("scale_bar", True):
+        add_scale_bar(ax)
+    fig.savefig(job["path"], dpi=job.get("dpi", FIGURE_DPI))
+    plt.close(fig)
+    return job["path"]
+
+def render_figures(jobs, n_jobs=None):
+    """Renders independent figures, in a process pool when `n_jobs` > 1. Returns the written paths."""
+    if n_jobs and n_jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(jobs))) as executor:
+            return list(executor.map(render_figure, jobs))
+    return [render_figure(job) for job in jobs]
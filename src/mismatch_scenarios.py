@@ -0,0 +1,96 @@
+# src/mismatch_scenarios.py
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+CLASSIFICATIONS = ("Gap", "Balanced", "Oversupply")
+
+def _minmax(x):
+    lo, hi = x.min(axis=-1, keepdims=True), x.max(axis=-1, keepdims=True)
+    span = hi - lo
+    return np.divide(x - lo, span, out=np.zeros_like(x, dtype=float), where=span > 0)
+
+def _rank(x):
+    n = x.shape[-1]
+    return (rankdata(x, axis=-1, method='average') - 1) / (n - 1) if n > 1 else np.zeros_like(x, dtype=float)
+
+def _zscore(x):
+    std = x.std(axis=-1, keepdims=True)
+    return np.divide(x - x.mean(axis=-1, keepdims=True), std, out=np.zeros_like(x, dtype=float), where=std > 0)
+
+# Row-wise normalizations of a (samples, regions) array; minmax matches sklearn's MinMaxScaler
+NORMALIZATIONS = {"minmax": _minmax, "rank": _rank, "zscore": _zscore}
+
+def region_codes(labels, regions):
+    """
+    Integer region code per paper (position among the unique `regions`, in order of
+    first appearance), -1 when missing or unknown.
+    """
+    categories = pd.unique(pd.Series(regions, dtype=object))
+    return pd.Categorical(pd.Series(labels, dtype=object), categories=categories).codes.astype(np.int64)
+
+def bootstrap_mismatch(demand, supply, codes, n_samples=2000, normalizations=("minmax",), assign_missing="uniform",
+                       gap_threshold=0.1, ci=0.95, seed=42, chunk_size=256):
+    """
+    Seeded scenario engine for the Mismatch Index (normalized demand - normalized supply).
+    Each sample
+    - resamples the papers with replacement (bootstrap),
+    - assigns papers without a region (code -1) uniformly at random, or drops them
+      with `assign_missing="drop"`,
+    - picks one of `normalizations` (see NORMALIZATIONS) for both indices.
+    Regional mean supply is a np.bincount over (sample, region) codes for a whole chunk of
+    samples; regions without papers get 0, as in the deterministic index.
+    Returns (per-region DataFrame of mean/std/CI of the mismatch and the probabilities of
+    gap (> gap_threshold), balanced and oversupply (< -gap_threshold), samples array).
+    """
+    demand = np.asarray(demand, dtype=float)
+    supply = np.asarray(supply, dtype=float)
+    codes = np.asarray(codes, dtype=np.int64)
+    n_regions, n_papers = len(demand), len(supply)
+    norm_funcs = [NORMALIZATIONS[name] for name in normalizations]
+    demand_norm = np.stack([f(demand) for f in norm_funcs])
+
+    rng = np.random.default_rng(seed)
+    samples = np.empty((n_samples, n_regions))
+    for start in range(0, n_samples, chunk_size):
+        size = min(chunk_size, n_samples - start)
+        idx = rng.integers(0, n_papers, size=(size, n_papers))
+        sample_codes = codes[idx]
+        missing = sample_codes < 0
+        if assign_missing == "uniform":
+            sample_codes = np.where(missing, rng.integers(0, n_regions, size=sample_codes.shape), sample_codes)
+            weights = np.ones(sample_codes.shape)
+        elif assign_missing == "drop":
+            sample_codes = np.where(missing, 0, sample_codes)
+            weights = (~missing).astype(float)
+        else:
+            raise ValueError(f"Unknown assign_missing '{assign_missing}'.")
+
+        cells = (np.arange(size)[:, None] * n_regions + sample_codes).ravel()
+        sums = np.bincount(cells, weights=(supply[idx] * weights).ravel(), minlength=size * n_regions)
+        counts = np.bincount(cells, weights=weights.ravel(), minlength=size * n_regions)
+        mean_supply = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0).reshape(size, n_regions)
+
+        method = rng.integers(0, len(norm_funcs), size=size)
+        supply_norm = np.empty_like(mean_supply)
+        for m, f in enumerate(norm_funcs):
+            rows = method == m
+            if rows.any():
+                supply_norm[rows] = f(mean_supply[rows])
+        samples[start:start + size] = demand_norm[method] - supply_norm
+
+    alpha = (1 - ci) / 2
+    p_gap = (samples > gap_threshold).mean(axis=0)
+    p_over = (samples < -gap_threshold).mean(axis=0)
+    probabilities = np.stack([p_gap, 1 - p_gap - p_over, p_over], axis=1)
+    stats = pd.DataFrame({
+        'mismatch_mean': samples.mean(axis=0),
+        'mismatch_std': samples.std(axis=0),
+        'ci_lower': np.quantile(samples, alpha, axis=0),
+        'ci_upper': np.quantile(samples, 1 - alpha, axis=0),
+        'p_gap': p_gap,
+        'p_balanced': probabilities[:, 1],
+        'p_oversupply': p_over,
+        'classification': np.array(CLASSIFICATIONS)[probabilities.argmax(axis=1)],
+    })
+    return stats, samples
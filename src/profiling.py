@@ -0,0 +1,94 @@
+# src/profiling.py
+import os
+import sys
+import json
+import time
+import platform
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILE_DIR = os.path.join("output", "profiling")
+
+# Sections recorded in this process, in order
+RECORDS = []
+
+def max_rss_mb():
+    """
+    Resident set size high-water mark of this process (and waited-for children) in MiB,
+    over the whole process lifetime so far.
+    """
+    if resource is None:
+        return None
+    scale = 1 / 1024**2 if sys.platform == "darwin" else 1 / 1024  # bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale
+
+def _children_cpu():
+    times = os.times()
+    return times.children_user + times.children_system
+
+def add_record(name, wall_s, cpu_s=None, rows=None, **extra):
+    """Records a section measured elsewhere (e.g. inside a worker process)."""
+    record = {"section": name, "wall_s": wall_s, "cpu_s": cpu_s, "max_rss_mb": max_rss_mb(), "rows": rows}
+    record.update(extra)
+    RECORDS.append(record)
+    return record
+
+@contextmanager
+def profile_section(name, rows=None, **extra):
+    """
+    Times a hot section: wall time, CPU time (this process and finished children),
+    row count and memory:
+    - max_rss_mb: the process RSS high-water mark at the end of the section;
+    - rss_growth_mb: how far the section raised that mark (0 when it stayed below an
+      earlier peak, so it is a lower bound on the section's own peak).
+    The yielded dict can be updated inside the block, e.g. record['rows'] = len(gdf).
+    """
+    record = {"section": name, "rows": rows, **extra}
+    wall_start, cpu_start, children_start = time.perf_counter(), time.process_time(), _children_cpu()
+    rss_start = max_rss_mb()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = time.perf_counter() - wall_start
+        record["cpu_s"] = time.process_time() - cpu_start
+        # CPU of worker processes that exited during the section (e.g. a process pool)
+        record["children_cpu_s"] = _children_cpu() - children_start
+        record["max_rss_mb"] = max_rss_mb()
+        record["rss_growth_mb"] = None if rss_start is None else record["max_rss_mb"] - rss_start
+        RECORDS.append(record)
+
+def write_run_report(stage, directory=PROFILE_DIR):
+    """Writes this process's section records to <directory>/stage_<stage>.json."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"stage_{stage}.json")
+    report = {
+        "stage": stage,
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "sections": RECORDS,
+    }
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    return path
+
+def merge_run_reports(directory=PROFILE_DIR, output_file="run_report.json"):
+    """Collects the per-stage reports into one run report."""
+    if not os.path.isdir(directory):
+        return None
+    stages = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("stage_") and name.endswith(".json"):
+            with open(os.path.join(directory, name), encoding='utf-8') as fh:
+                stages.append(json.load(fh))
+    path = os.path.join(directory, output_file)
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({"stages": stages}, fh, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,276 @@
+# src/raster_surface.py
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import shapely
+from spatial_aggregation import RATIO_COLUMNS
+from layer_store import iter_processed_layer, store_path_for, PROCESSED_LAYERS
+from topsis import benefit_mask, shrunk_inverse
+
+class Grid:
+    """
+    Fixed square grid in the layer CRS (EPSG:5179 metres), row 0 at the top (north).
+    Cell (row, col) spans x in [minx + col*size, minx + (col+1)*size] and
+    y in [maxy - (row+1)*size, maxy - row*size].
+    """
+    def __init__(self, minx, maxy, cell_size, nx, ny):
+        self.minx, self.maxy = float(minx), float(maxy)
+        self.cell_size = float(cell_size)
+        self.nx, self.ny = int(nx), int(ny)
+
+    @classmethod
+    def from_bounds(cls, bounds, cell_size=100.0):
+        """Grid covering `bounds`, snapped to multiples of `cell_size`."""
+        minx, miny, maxx, maxy = bounds
+        minx, miny = np.floor(minx / cell_size) * cell_size, np.floor(miny / cell_size) * cell_size
+        maxx, maxy = np.ceil(maxx / cell_size) * cell_size, np.ceil(maxy / cell_size) * cell_size
+        return cls(minx, maxy, cell_size, round((maxx - minx) / cell_size), round((maxy - miny) / cell_size))
+
+    @property
+    def shape(self):
+        return self.ny, self.nx
+
+    @property
+    def extent(self):
+        """(left, right, bottom, top) for matplotlib's imshow."""
+        return (self.minx, self.minx + self.nx * self.cell_size, self.maxy - self.ny * self.cell_size, self.maxy)
+
+    def to_dict(self):
+        return {"minx": self.minx, "maxy": self.maxy, "cell_size": self.cell_size, "nx": self.nx, "ny": self.ny}
+
+    def cell_boxes(self, rows, cols):
+        s = self.cell_size
+        return shapely.box(self.minx + cols * s, self.maxy - (rows + 1) * s, self.minx + (cols + 1) * s, self.maxy - rows * s)
+
+    def cell_windows(self, bounds):
+        """Row/column ranges [start, stop) of the cells overlapped by each (minx, miny, maxx, maxy)."""
+        s = self.cell_size
+        col0 = np.clip(np.floor((bounds[:, 0] - self.minx) / s), 0, self.nx).astype(np.int64)
+        col1 = np.clip(np.ceil((bounds[:, 2] - self.minx) / s), 0, self.nx).astype(np.int64)
+        row0 = np.clip(np.floor((self.maxy - bounds[:, 3]) / s), 0, self.ny).astype(np.int64)
+        row1 = np.clip(np.ceil((self.maxy - bounds[:, 1]) / s), 0, self.ny).astype(np.int64)
+        return row0, row1, col0, col1
+
+def _feature_cell_pairs(grid, bounds, max_pairs):
+    """Yields (feature index, row, col) arrays for batches of features, about `max_pairs` pairs each."""
+    row0, row1, col0, col1 = grid.cell_windows(bounds)
+    width = np.maximum(col1 - col0, 0)
+    n_cells = width * np.maximum(row1 - row0, 0)
+    ends = np.cumsum(n_cells)
+    start = 0
+    while start < len(bounds):
+        stop = max(int(np.searchsorted(ends, (ends[start - 1] if start else 0) + max_pairs, side='right')), start + 1)
+        feature = np.repeat(np.arange(start, stop), n_cells[start:stop])
+        offset = np.arange(len(feature)) - np.repeat(ends[start:stop] - n_cells[start:stop], n_cells[start:stop])
+        yield feature, row0[feature] + offset // width[feature], col0[feature] + offset % width[feature]
+        start = stop
+
+def add_coverage(coverage, grid, gdf_layers, sources=None, max_pairs=1_000_000):
+    """
+    Adds the cell coverage of a chunk of layer features to `coverage` (n_sources, ny, nx):
+    the clipped feature area in each cell as a fraction of the cell area. Cells lying
+    entirely inside a feature skip the intersection. Overlapping features of one source
+    add up, as in the polygon overlay.
+    """
+    sources = sources or RATIO_COLUMNS
+    mask = gdf_layers['SOURCE'].isin(list(sources)).to_numpy()
+    geoms = gdf_layers.geometry.to_numpy()[mask]
+    codes = pd.Categorical(gdf_layers['SOURCE'].to_numpy()[mask], categories=list(sources)).codes.astype(np.int64)
+    shapely.prepare(geoms)
+    flat = coverage.reshape(-1)
+    cell_area = grid.cell_size ** 2
+    for feature, rows, cols in _feature_cell_pairs(grid, shapely.bounds(geoms), max_pairs):
+        cells = grid.cell_boxes(rows, cols)
+        inside = shapely.contains_properly(geoms[feature], cells)
+        fractions = np.ones(len(feature))
+        partial = ~inside
+        if partial.any():
+            fractions[partial] = shapely.area(shapely.intersection(geoms[feature[partial]], cells[partial])) / cell_area
+        hit = fractions > 0
+        np.add.at(flat, (codes[feature[hit]] * grid.ny + rows[hit]) * grid.nx + cols[hit], fractions[hit])
+
+def zone_labels(grid, gdf_zones, row_block=256):
+    """
+    Rasterized zone index per cell (int32, -1 outside every zone), assigned by cell
+    centre. Built once per zoning; re-aggregating to that zoning is then an array reduction.
+    """
+    labels = np.full(grid.shape, -1, dtype=np.int32)
+    tree = shapely.STRtree(gdf_zones.geometry.to_numpy())
+    xs = grid.minx + (np.arange(grid.nx) + 0.5) * grid.cell_size
+    for r0 in range(0, grid.ny, row_block):
+        r1 = min(r0 + row_block, grid.ny)
+        ys = grid.maxy - (np.arange(r0, r1) + 0.5) * grid.cell_size
+        points = shapely.points(np.tile(xs, r1 - r0), np.repeat(ys, grid.nx))
+        point_idx, zone_idx = tree.query(points, predicate='within')
+        block = labels[r0:r1].reshape(-1)
+        block[point_idx[::-1]] = zone_idx[::-1]  # first matching zone wins
+    return labels
+
+def zonal_sums(values, labels, n_zones, row_block=1024):
+    """
+    Sums (k, ny, nx) cell values per zone with np.bincount, reading `row_block` rows
+    at a time so memory-mapped arrays are never loaded whole.
+    Returns (n_zones, k) sums and the (n_zones,) cell counts.
+    """
+    k = values.shape[0]
+    sums, counts = np.zeros((n_zones, k)), np.zeros(n_zones)
+    for r0 in range(0, labels.shape[0], row_block):
+        lab = labels[r0:r0 + row_block].reshape(-1)
+        inside = lab >= 0
+        lab = lab[inside]
+        counts += np.bincount(lab, minlength=n_zones)
+        block = np.asarray(values[:, r0:r0 + row_block]).reshape(k, -1)[:, inside]
+        for j in range(k):
+            sums[:, j] += np.bincount(lab, weights=block[j], minlength=n_zones)
+    return sums, counts
+
+def _layer_signature(processed_path):
+    """Size/mtime of the processed layer files, to invalidate the cached coverage."""
+    entries = []
+    for path in (store_path_for(processed_path, "all_layers"),
+                 os.path.join(processed_path, f"{PROCESSED_LAYERS['all_layers']}.gpkg")):
+        files = [path] if os.path.isfile(path) else sorted(
+            os.path.join(root, f) for root, _, names in os.walk(path) for f in names)
+        for f in files:
+            stat = os.stat(f)
+            entries.append([f, stat.st_size, stat.st_mtime_ns])
+    return entries
+
+def coverage_dir(processed_path, cell_size):
+    return os.path.join(processed_path, f"coverage_grid_{int(cell_size)}m")
+
+def load_or_build_coverage(processed_path, bounds, cell_size=100.0, sources=None, chunk_size=100000):
+    """
+    Memory-mapped coverage array (n_sources, ny, nx) of the processed layers, stored in
+    <processed_path>/coverage_grid_<cell_size>m/. It is rasterized once, streaming the
+    layers in chunks, and reused while the layer files and grid are unchanged.
+    Returns (coverage memmap, Grid).
+    """
+    sources = sources or RATIO_COLUMNS
+    grid = Grid.from_bounds(bounds, cell_size)
+    directory = coverage_dir(processed_path, cell_size)
+    data_file, meta_file = os.path.join(directory, "coverage.npy"), os.path.join(directory, "meta.json")
+    meta = {"grid": grid.to_dict(), "sources": list(sources), "layers": _layer_signature(processed_path)}
+    if os.path.exists(meta_file) and os.path.exists(data_file):
+        with open(meta_file, encoding='utf-8') as fh:
+            if json.load(fh) == meta:
+                print(f"Reusing rasterized coverage from {directory}")
+                return np.load(data_file, mmap_mode='r'), grid
+
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+    coverage = np.lib.format.open_memmap(data_file, mode='w+', dtype=np.float32, shape=(len(sources),) + grid.shape)
+    print(f"Rasterizing layers onto a {grid.nx} x {grid.ny} grid of {cell_size:g} m cells...")
+    for chunk in iter_processed_layer("all_layers", processed_path, columns=['SOURCE'],
+                                      partitions={'SOURCE': list(sources)}, bbox=bounds, chunk_size=chunk_size):
+        add_coverage(coverage, grid, chunk, sources)
+    coverage.flush()
+    with open(meta_file, 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh, ensure_ascii=False)
+    return np.load(data_file, mmap_mode='r'), grid
+
+def load_or_build_labels(directory, grid, gdf_zones, name):
+    """
+    Cached zone_labels raster for one zoning (e.g. "sido", "sigungu") in `directory`,
+    rebuilt when the grid or the zone geometries change.
+    """
+    label_file = os.path.join(directory, f"zones_{name}.npy")
+    meta_file = os.path.join(directory, f"zones_{name}.json")
+    digest = hashlib.sha256(b"".join(shapely.to_wkb(gdf_zones.geometry.to_numpy()))).hexdigest()
+    meta = {"grid": grid.to_dict(), "zones": len(gdf_zones), "sha256": digest}
+    if os.path.exists(meta_file) and os.path.exists(label_file):
+        with open(meta_file, encoding='utf-8') as fh:
+            if json.load(fh) == meta:
+                return np.load(label_file, mmap_mode='r')
+    np.save(label_file, zone_labels(grid, gdf_zones))
+    with open(meta_file, 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh)
+    return np.load(label_file, mmap_mode='r')
+
+def zonal_ratios(coverage, labels, gdf_zones, region_col='SIDO_NM', sources=None):
+    """Per-zone ratios (the RATIO_COLUMNS of stage 02) as mean cell coverage of each zone."""
+    sources = sources or RATIO_COLUMNS
+    sums, counts = zonal_sums(coverage, labels, len(gdf_zones))
+    ratios = np.divide(sums, counts[:, None], out=np.zeros_like(sums), where=counts[:, None] > 0)
+    df = pd.DataFrame({region_col: gdf_zones[region_col].to_numpy(), 'n_cells': counts.astype(np.int64)},
+                      index=gdf_zones.index)
+    for i, source in enumerate(sources):
+        df[sources[source]] = ratios[:, i]
+    return df
+
+def _inside_cells(coverage, labels, row_block):
+    """Yields (r0, r1, inside mask, cells x criteria float matrix) per block of `row_block` rows."""
+    for r0 in range(0, labels.shape[0], row_block):
+        r1 = min(r0 + row_block, labels.shape[0])
+        inside = np.asarray(labels[r0:r1]) >= 0
+        yield r0, r1, inside, np.asarray(coverage[:, r0:r1])[:, inside].T.astype(float)
+
+def cell_opportunity(coverage, labels, weights, benefit_criteria, distance="euclidean", shrinkage=0.1,
+                     row_block=1024, out=None):
+    """
+    TOPSIS closeness of every cell inside a zone (same result as enhanced_topsis on the
+    cell x criteria matrix), min-max scaled to 0-100 like the regional index. Cells
+    outside are NaN. The memory-mapped coverage is read `row_block` rows at a time:
+    - pass 1 accumulates the column norms, extremes and (for "mahalanobis") the
+      covariance, which give the ideal and anti-ideal points;
+    - pass 2 scores each block against them into `out` (a new float32 array when None,
+      e.g. an np.lib.format.open_memmap), which is then rescaled in place.
+    """
+    n_criteria = coverage.shape[0]
+    n, mean, m2 = 0, np.zeros(n_criteria), np.zeros((n_criteria, n_criteria))
+    sum_sq = np.zeros(n_criteria)
+    col_max, col_min = np.full(n_criteria, -np.inf), np.full(n_criteria, np.inf)
+    for _, _, _, block in _inside_cells(coverage, labels, row_block):
+        if not len(block):
+            continue
+        sum_sq += (block**2).sum(axis=0)
+        col_max, col_min = np.maximum(col_max, block.max(axis=0)), np.minimum(col_min, block.min(axis=0))
+        # Pairwise (Chan et al.) merge of the block mean and co-moment into the running ones
+        block_mean = block.mean(axis=0)
+        centred = block - block_mean
+        delta = block_mean - mean
+        total = n + len(block)
+        m2 += centred.T @ centred + np.outer(delta, delta) * n * len(block) / total
+        mean += delta * len(block) / total
+        n = total
+
+    surface = np.full(labels.shape, np.nan, dtype=np.float32) if out is None else out
+    if n == 0:
+        surface[...] = np.nan
+        return surface
+    norms = np.sqrt(sum_sq)
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)  # vector normalization
+    mask = benefit_mask(n_criteria, benefit_criteria)
+    pis = np.where(mask, col_max, col_min) * scale
+    nis = np.where(mask, col_min, col_max) * scale
+    weights = np.asarray(weights, dtype=float)
+    if distance == "mahalanobis":
+        cov = m2 / (n - 1) * np.outer(scale, scale) if n > 1 else np.eye(n_criteria)
+        inv_cov = shrunk_inverse(cov, shrinkage)
+    elif distance != "euclidean":
+        raise ValueError(f"Unknown TOPSIS distance '{distance}'.")
+
+    def weighted_distance(d):
+        wd = d * weights
+        squared = (wd**2).sum(axis=1) if distance == "euclidean" else np.einsum('ri,ij,rj->r', wd, inv_cov, wd)
+        return np.sqrt(np.clip(squared, 0, None))
+
+    low, high = np.inf, -np.inf
+    for r0, r1, inside, block in _inside_cells(coverage, labels, row_block):
+        norm_block = block * scale
+        to_pis, to_nis = weighted_distance(norm_block - pis), weighted_distance(norm_block - nis)
+        total = to_pis + to_nis
+        scores = np.divide(to_nis, total, out=np.zeros_like(total), where=total > 0)
+        rows = np.full(inside.shape, np.nan, dtype=np.float32)
+        rows[inside] = scores
+        surface[r0:r1] = rows
+        if len(scores):  # extremes of the stored float32 values, so the rescaled range is exactly 0-100
+            low, high = min(low, float(rows[inside].min())), max(high, float(rows[inside].max()))
+    span = high - low
+    for r0 in range(0, labels.shape[0], row_block):
+        rows = surface[r0:r0 + row_block]
+        rows[...] = (rows - low) / span * 100 if span > 0 else np.where(np.isnan(rows), np.nan, 0)
+    return surface
@@ -0,0 +1,111 @@
+# src/region_classifier.py
+import numpy as np
+import pandas as pd
+import shapely
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyproj import CRS, Transformer
+from layer_store import load_processed_layer
+
+class RegionClassifier:
+    """
+    Point-in-polygon region assignment against the admin boundaries.
+    - The polygons are indexed (STRtree) and prepared once.
+    - Points are bulk-queried with a vectorized containment predicate; points on a
+      shared border go to the first region in layer order.
+    - Points inside no polygon (coastline, layer edges) fall back to the nearest
+      polygon, within `max_distance` map units when given.
+    `columns` are the admin attributes returned per point (e.g. SIDO_NM, sigungu codes).
+    """
+    def __init__(self, gdf_admin, columns=('SIDO_NM',), max_distance=None):
+        self.columns = list(columns)
+        # String dtypes keep unmatched (missing) rows typed, e.g. for Parquet output
+        self.attributes = gdf_admin[self.columns].reset_index(drop=True).convert_dtypes(
+            convert_integer=False, convert_floating=False, convert_boolean=False)
+        self.crs = gdf_admin.crs
+        self.max_distance = max_distance
+        geoms = gdf_admin.geometry.to_numpy()
+        shapely.prepare(geoms)
+        self.tree = shapely.STRtree(geoms)
+        self._transformers = {}
+
+    @classmethod
+    def from_processed(cls, processed_path="data/processed", columns=('SIDO_NM',), max_distance=None):
+        return cls(load_processed_layer("admin_boundaries", processed_path, columns=list(columns)),
+                   columns=columns, max_distance=max_distance)
+
+    def _project(self, x, y, crs):
+        if crs is None or CRS.from_user_input(crs) == self.crs:
+            return x, y
+        key = CRS.from_user_input(crs).to_string()
+        if key not in self._transformers:
+            self._transformers[key] = Transformer.from_crs(crs, self.crs, always_xy=True)
+        return self._transformers[key].transform(x, y)
+
+    def classify_xy(self, x, y, crs=None):
+        """
+        Region index per point (-1 when unmatched), the match type ("within",
+        "nearest" or None) and the distance to the region in map units.
+        Points with missing coordinates stay unmatched.
+        """
+        x, y = self._project(np.asarray(x, dtype=float), np.asarray(y, dtype=float), crs)
+        n = len(x)
+        region = np.full(n, -1, dtype=np.int64)
+        distance = np.full(n, np.nan)
+        valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        points = shapely.points(x[valid], y[valid])
+
+        point_idx, region_idx = self.tree.query(points, predicate='within')
+        region[valid[point_idx[::-1]]] = region_idx[::-1]  # first region wins on shared borders
+        distance[valid[point_idx]] = 0.0
+
+        missed = np.flatnonzero(region[valid] < 0)
+        if len(missed):
+            (near_point, near_region), near_distance = self.tree.query_nearest(
+                points[missed], max_distance=self.max_distance, return_distance=True, all_matches=False)
+            region[valid[missed[near_point]]] = near_region
+            distance[valid[missed[near_point]]] = near_distance
+
+        match = np.where(region < 0, None, np.where(distance > 0, "nearest", "within"))
+        return region, match, distance
+
+    def classify_frame(self, df, x_col='longitude', y_col='latitude', crs="EPSG:4326"):
+        """`df` with the region attributes, `region_match` and `region_distance_m` appended."""
+        region, match, distance = self.classify_xy(df[x_col].to_numpy(), df[y_col].to_numpy(), crs=crs)
+        result = self.attributes.reindex(np.where(region >= 0, region, len(self.attributes)))
+        result.index = df.index
+        result['region_match'] = pd.Series(match, index=df.index, dtype="string")
+        result['region_distance_m'] = distance
+        return pd.concat([df.drop(columns=[c for c in result.columns if c in df.columns]), result], axis=1)
+
+    def classify_file(self, input_path, output_path, x_col='longitude', y_col='latitude', crs="EPSG:4326",
+                      chunk_size=500000):
+        """
+        Streams a CSV or Parquet file of points through classify_frame in chunks of
+        `chunk_size` rows and writes the result in the format of `output_path`.
+        Returns the number of rows written.
+        """
+        if input_path.lower().endswith(".parquet"):
+            source = (batch.to_pandas() for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunk_size))
+        else:
+            source = pd.read_csv(input_path, chunksize=chunk_size)
+
+        to_parquet = output_path.lower().endswith(".parquet")
+        writer, rows = None, 0
+        try:
+            for i, chunk in enumerate(source):
+                result = self.classify_frame(chunk, x_col, y_col, crs=crs)
+                if to_parquet:
+                    table = pa.Table.from_pandas(result, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(output_path, table.schema)
+                    writer.write_table(table.cast(writer.schema))
+                else:
+                    result.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False,
+                                  encoding='utf-8-sig' if i == 0 else 'utf-8')
+                rows += len(result)
+                print(f"  Classified {rows} points...")
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
@@ -0,0 +1,211 @@
+# src/run_pipeline.py
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from profiling import merge_run_reports
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join("data", "processed", "pipeline_state.json")
+
+# Each stage declares the files/directories it reads and the files it produces.
+# Dependencies between stages follow from matching outputs to inputs.
+STAGES = {
+    "01": {
+        "script": "01_geospatial_preprocessing.py",
+        "inputs": ["data/raw/02_geospatial_layers", "data/raw/03_administrative_boundaries"],
+        "outputs": ["data/processed/LSMD_CONT_ALL.gpkg", "data/processed/LSMD_CONT_ADMIN_ALL.gpkg"],
+    },
+    "02": {
+        "script": "02_zeb_opportunity_analysis.py",
+        "inputs": ["data/processed/LSMD_CONT_ALL.gpkg", "data/processed/LSMD_CONT_ADMIN_ALL.gpkg",
+                   "data/processed/LSMD_CONT_ALL.parquet", "data/processed/LSMD_CONT_ADMIN_ALL.parquet"],
+        "outputs": ["output/reports/zeb_opportunity_index.csv"],
+    },
+    "03": {
+        "script": "03_address_geocoding.py",
+        "inputs": ["data/raw/address_list_to_geocode.xlsx", "data/raw/address_gazetteer.csv",
+                   "data/processed/table_cache/address_list_to_geocode.parquet",
+                   "data/processed/LSMD_CONT_ADMIN_ALL.gpkg", "data/processed/LSMD_CONT_ADMIN_ALL.parquet"],
+        "outputs": ["data/processed/geocoded_addresses_with_admin.gpkg"],
+    },
+    "04": {
+        "script": "04_research_complex_analysis.py",
+        "inputs": ["data/raw/04_research_complexes", "data/processed/geocoded_addresses_with_admin.gpkg",
+                   "data/processed/LSMD_CONT_ALL.gpkg", "data/processed/LSMD_CONT_ALL.parquet"],
+        "outputs": ["output/reports/addresses_with_distance_to_complex.csv"],
+    },
+    "05": {
+        "script": "05_paper_impact_analysis.py",
+        "inputs": ["data/raw/academic_papers_list.xlsx", "data/processed/table_cache/academic_papers_list.parquet"],
+        "outputs": ["output/reports/comprehensive_paper_analysis.parquet"],
+    },
+    "06": {
+        "script": "06_mismatch_analysis.py",
+        "inputs": ["output/reports/zeb_opportunity_index.csv", "output/reports/comprehensive_paper_analysis.parquet",
+                   "data/processed/LSMD_CONT_ADMIN_ALL.gpkg", "data/processed/LSMD_CONT_ADMIN_ALL.parquet"],
+        "outputs": ["output/reports/zeb_mismatch_analysis_results.parquet"],
+    },
+}
+
+def stage_dependencies(stages):
+    """{stage: set of upstream stages whose outputs it reads}."""
+    producers = {out: name for name, stage in stages.items() for out in stage["outputs"]}
+    return {name: {producers[i] for i in stage["inputs"] if i in producers and producers[i] != name}
+            for name, stage in stages.items()}
+
+def _path_signature(path):
+    """Size and mtime of a file, or of every file below a directory."""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [[path, stat.st_size, stat.st_mtime_ns]]
+    entries = []
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for f in sorted(files):
+                full = os.path.join(root, f)
+                stat = os.stat(full)
+                entries.append([full, stat.st_size, stat.st_mtime_ns])
+    return entries
+
+def _local_imports(filename):
+    """Local src modules imported by one file (import statements and importlib.import_module calls)."""
+    with open(os.path.join(SRC_DIR, filename), encoding='utf-8') as fh:
+        source = fh.read()
+    modules = re.findall(r"^\s*(?:from|import)\s+(\w+)", source, flags=re.M)
+    modules += re.findall(r"import_module\(\"(\w+)\"\)", source)
+    return [f"{m}.py" for m in modules if os.path.exists(os.path.join(SRC_DIR, f"{m}.py"))]
+
+def code_files(script):
+    """The stage script plus every local src module it imports, directly or transitively."""
+    files, pending = [script], [script]
+    while pending:
+        for module in _local_imports(pending.pop()):
+            if module not in files:
+                files.append(module)
+                pending.append(module)
+    return files
+
+def stage_fingerprint(stage):
+    """Hash of the stage's input signatures and code."""
+    digest = hashlib.sha256()
+    for path in stage["inputs"]:
+        digest.update(json.dumps(_path_signature(path)).encode())
+    for f in code_files(stage["script"]):
+        with open(os.path.join(SRC_DIR, f), 'rb') as fh:
+            digest.update(f.encode() + hashlib.sha256(fh.read()).digest())
+    return digest.hexdigest()
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, encoding='utf-8') as fh:
+        return json.load(fh)
+
+def save_state(state):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE, 'w', encoding='utf-8') as fh:
+        json.dump(state, fh, indent=2, sort_keys=True)
+
+def _written_since(path, started):
+    """Whether `path` exists and was modified at or after the wall-clock time `started`."""
+    # One second of slack covers file systems with coarse modification times
+    return os.path.exists(path) and os.path.getmtime(path) >= started - 1.0
+
+def run_stage(name, stage):
+    """Runs one stage script in its own process; returns (return code, seconds, wall-clock start)."""
+    started_at = time.time()
+    started = time.perf_counter()
+    log_path = os.path.join("output", "logs", f"stage_{name}.log")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    with open(log_path, 'w', encoding='utf-8') as log:
+        proc = subprocess.run([sys.executable, os.path.join(SRC_DIR, stage["script"])],
+                              stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, time.perf_counter() - started, started_at
+
+def run_pipeline(selected=None, force=False, max_workers=2, stages=STAGES):
+    """
+    Runs the selected stages (all by default) in dependency order, from the repository root.
+    - A stage is a cache hit, and is skipped, when its input fingerprint and code
+      are unchanged since its last successful run and its outputs exist.
+    - Stages whose dependencies are done run concurrently in separate processes
+      (e.g. 03 and 05 alongside 02).
+    The per-stage profiling reports are merged into output/profiling/run_report.json.
+    A run only succeeds when the script exits with 0 and rewrites all of its outputs.
+    Returns {stage: status} with status in hit / miss / failed / skipped.
+    """
+    selected = set(selected or stages)
+    unknown = selected - set(stages)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))} (available: {', '.join(sorted(stages))})")
+    deps = {name: d & selected for name, d in stage_dependencies(stages).items() if name in selected}
+    state = load_state()
+    status, timings, running = {}, {}, {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(status) < len(deps):
+            for name in sorted(deps):
+                if name in status or name in running:
+                    continue
+                if any(status.get(d) in ("failed", "skipped") for d in deps[name]):
+                    status[name] = "skipped"
+                    continue
+                if not all(status.get(d) in ("hit", "miss") for d in deps[name]):
+                    continue
+                stage = stages[name]
+                fingerprint = stage_fingerprint(stage)
+                outputs_exist = all(os.path.exists(o) for o in stage["outputs"])
+                if not force and outputs_exist and state.get(name) == fingerprint:
+                    status[name], timings[name] = "hit", 0.0
+                    print(f"[{name}] cache hit, skipping {stage['script']}")
+                    continue
+                print(f"[{name}] running {stage['script']}")
+                running[name] = executor.submit(run_stage, name, stage)
+
+            if not running:
+                continue
+            done, _ = wait(list(running.values()), return_when=FIRST_COMPLETED)
+            for name in [n for n, f in running.items() if f in done]:
+                future = running.pop(name)
+                returncode, seconds, started = future.result()
+                timings[name] = seconds
+                # Outputs left over from an earlier run do not count: each must be written by this run
+                if returncode == 0 and all(_written_since(o, started) for o in stages[name]["outputs"]):
+                    status[name] = "miss"
+                    # Recomputed so that caches the stage itself writes (e.g. table_cache) do not force a rerun
+                    state[name] = stage_fingerprint(stages[name])
+                    save_state(state)
+                else:
+                    status[name] = "failed"
+                    state.pop(name, None)
+                    save_state(state)
+                print(f"[{name}] {status[name]} in {seconds:.1f}s (log: output/logs/stage_{name}.log)")
+
+    print("\nStage  Status   Seconds")
+    for name in sorted(status):
+        print(f"{name:<6} {status[name]:<8} {timings.get(name, 0.0):.1f}")
+    report = merge_run_reports()
+    if report:
+        print(f"Profiling report: {report}")
+    return status
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ZEB mismatch pipeline stages with caching.")
+    parser.add_argument("stages", nargs="*", help="stages to run (default: all), e.g. 02 06")
+    parser.add_argument("--force", action="store_true", help="ignore cached fingerprints")
+    parser.add_argument("--jobs", type=int, default=2, help="stages to run concurrently")
+    args = parser.parse_args()
+    try:
+        status = run_pipeline(args.stages or None, force=args.force, max_workers=args.jobs)
+    except ValueError as e:
+        parser.error(str(e))
+    sys.exit(1 if "failed" in status.values() else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# src/spatial_aggregation.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import shapely
+
+# Output column for each layer SOURCE, in the order used by the TOPSIS matrix
+RATIO_COLUMNS = {
+    'Supply': 'supply_ratio',
+    'Demand': 'demand_ratio',
+    'Environment': 'env_constraint_ratio',
+}
+# Column prefix of each SOURCE in admin_stats.csv
+STAT_PREFIXES = {
+    'Supply': 'supply',
+    'Demand': 'demand',
+    'Environment': 'constraint',
+}
+
+def _clipped_areas(region_geoms, feature_geoms):
+    """
+    Computes the area of each (region, feature) pair clipped to the region.
+    Features lying entirely inside their region skip the intersection.
+    """
+    shapely.prepare(region_geoms)
+    inside = shapely.contains_properly(region_geoms, feature_geoms)
+    areas = shapely.area(feature_geoms)
+    partial = ~inside
+    if partial.any():
+        areas[partial] = shapely.area(shapely.intersection(region_geoms[partial], feature_geoms[partial]))
+    return areas
+
+def _split_by_region(region_idx, n_regions, n_chunks):
+    """Yields index arrays into the pair list, one per contiguous chunk of regions."""
+    bounds = np.linspace(0, n_regions, n_chunks + 1).astype(int)
+    order = np.argsort(region_idx, kind='stable')
+    cuts = np.searchsorted(region_idx[order], bounds)
+    for start, stop in zip(cuts[:-1], cuts[1:]):
+        if stop > start:
+            yield order[start:stop]
+
+class RegionAreaAccumulator:
+    """
+    Running per-region clipped area and feature count of each SOURCE.
+    - The admin polygons are indexed once (STRtree); layer features are added in any
+      number of chunks, so only one chunk has to be held in memory.
+    - Pairs are added in feature order with unbuffered adds (np.add.at), so features
+      streamed in chunks give bit-identical totals to a single in-memory pass.
+    A feature counts towards a region when its clipped area there is positive.
+    """
+    def __init__(self, gdf_admin, region_col='SIDO_NM', sources=None):
+        self.sources = sources or RATIO_COLUMNS
+        self.gdf_admin = gdf_admin
+        self.region_col = region_col
+        self.region_geoms = gdf_admin.geometry.to_numpy()
+        self.tree = shapely.STRtree(self.region_geoms)
+        n_regions, n_sources = len(self.region_geoms), len(self.sources)
+        self.areas = np.zeros(n_regions * n_sources)
+        self.counts = np.zeros(n_regions * n_sources, dtype=np.int64)
+        self.n_features = 0
+        self.n_pairs = 0
+
+    def add(self, gdf_layers, n_jobs=1):
+        """Adds a chunk of layer features; `n_jobs` > 1 clips its pairs in several processes."""
+        if gdf_layers.crs != self.gdf_admin.crs:
+            gdf_layers = gdf_layers.to_crs(self.gdf_admin.crs)
+        layer_mask = gdf_layers['SOURCE'].isin(list(self.sources)).to_numpy()
+        layer_geoms = gdf_layers.geometry.to_numpy()[layer_mask]
+        source_codes = pd.Categorical(gdf_layers['SOURCE'].to_numpy()[layer_mask],
+                                      categories=list(self.sources)).codes
+        n_regions, n_sources = len(self.region_geoms), len(self.sources)
+
+        feature_idx, region_idx = self.tree.query(layer_geoms, predicate='intersects')
+        order = np.argsort(feature_idx, kind='stable')
+        feature_idx, region_idx = feature_idx[order], region_idx[order]
+
+        n_jobs = min(n_jobs or 1, os.cpu_count() or 1, max(n_regions, 1))
+        if n_jobs > 1 and len(region_idx) > 0:
+            chunks = list(_split_by_region(region_idx, n_regions, n_jobs))
+            areas = np.zeros(len(region_idx))
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = [executor.submit(_clipped_areas, self.region_geoms[region_idx[c]], layer_geoms[feature_idx[c]])
+                           for c in chunks]
+                for chunk, future in zip(chunks, futures):
+                    areas[chunk] = future.result()
+        else:
+            areas = _clipped_areas(self.region_geoms[region_idx], layer_geoms[feature_idx])
+
+        cells = region_idx * n_sources + source_codes[feature_idx]
+        np.add.at(self.areas, cells, areas)
+        np.add.at(self.counts, cells, (areas > 0).astype(np.int64))
+        self.n_features += len(layer_geoms)
+        self.n_pairs += len(region_idx)
+        return self
+
+    def totals(self):
+        """(areas, counts) as (n_regions, n_sources) arrays."""
+        shape = (len(self.region_geoms), len(self.sources))
+        return self.areas.reshape(shape), self.counts.reshape(shape)
+
+    def ratios(self):
+        """One row per admin feature holding `region_col` and the area ratio of each source."""
+        areas, _ = self.totals()
+        region_area = shapely.area(self.region_geoms)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(region_area[:, None] > 0, areas / region_area[:, None], 0.0)
+        df_analysis = pd.DataFrame({self.region_col: self.gdf_admin[self.region_col].to_numpy()},
+                                   index=self.gdf_admin.index)
+        for i, source in enumerate(self.sources):
+            df_analysis[self.sources[source]] = ratios[:, i]
+        return df_analysis
+
+    def admin_stats(self, prefixes=None):
+        """
+        Per-region summary (admin_stats.csv): admin area, and for each source the
+        feature count, clipped area (km²) and share of the admin area (%).
+        """
+        prefixes = prefixes or STAT_PREFIXES
+        areas, counts = self.totals()
+        admin_area = shapely.area(self.region_geoms) / 1e6
+        stats = pd.DataFrame({'id': self.gdf_admin[self.region_col].to_numpy(), 'admin_area_km2': admin_area})
+        for i, source in enumerate(self.sources):
+            stats[f'{prefixes[source]}_count'] = counts[:, i]
+        for i, source in enumerate(self.sources):
+            stats[f'{prefixes[source]}_area_km2'] = areas[:, i] / 1e6
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i, source in enumerate(self.sources):
+                stats[f'{prefixes[source]}_pct'] = np.where(admin_area > 0, areas[:, i] / 1e6 / admin_area * 100, 0.0)
+        return stats
+
+def aggregate_layer_areas(gdf_layers, gdf_admin, region_col='SIDO_NM', sources=None, n_jobs=1):
+    """
+    Sums clipped layer area per administrative region and SOURCE in a single pass.
+    - Bulk-queries an STRtree of the regions with all layer features.
+    - Computes intersection areas for the candidate pairs with vectorized shapely calls.
+    - Optionally spreads the clipping over `n_jobs` processes by chunks of regions.
+    `sources` maps SOURCE labels to output columns (defaults to RATIO_COLUMNS).
+    Returns one row per admin feature (aligned with `gdf_admin`) holding `region_col`
+    and the area ratio of each source.
+    """
+    accumulator = RegionAreaAccumulator(gdf_admin, region_col=region_col, sources=sources).add(gdf_layers, n_jobs=n_jobs)
+    print(f"  Spatial index matched {accumulator.n_pairs} region-feature pairs across {len(gdf_admin)} regions.")
+    return accumulator.ratios()
+
+def aggregate_layer_chunks(chunks, gdf_admin, region_col='SIDO_NM', sources=None, n_jobs=1):
+    """
+    Out-of-core variant of aggregate_layer_areas: consumes an iterable of layer
+    GeoDataFrames (e.g. layer_store.iter_processed_layer) one chunk at a time.
+    Returns the RegionAreaAccumulator (see its ratios() and admin_stats()).
+    """
+    accumulator = RegionAreaAccumulator(gdf_admin, region_col=region_col, sources=sources)
+    for i, chunk in enumerate(chunks, 1):
+        accumulator.add(chunk, n_jobs=n_jobs)
+        print(f"  Chunk {i}: {len(chunk)} features, {accumulator.n_features} so far.")
+    print(f"  Spatial index matched {accumulator.n_pairs} region-feature pairs across {len(gdf_admin)} regions.")
+    return accumulator
@@ -0,0 +1,75 @@
+# src/table_io.py
+import os
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+
+def _arrow_safe(df):
+    """Object columns mixing types (common in Excel sheets) are stored as strings."""
+    df = df.copy()
+    for col in df.select_dtypes(include=['object']).columns:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+def write_table(df, path):
+    """Writes a DataFrame as Parquet or Feather (by extension), without the index."""
+    df = _arrow_safe(df).reset_index(drop=True)
+    if path.lower().endswith((".feather", ".arrow")):
+        feather.write_feather(df, path)
+    else:
+        df.to_parquet(path, index=False)
+    return path
+
+def table_columns(path):
+    """Column names of a Parquet/Feather file, read from its schema only."""
+    if path.lower().endswith((".feather", ".arrow")):
+        return pa.ipc.open_file(path).schema.names
+    return pq.read_schema(path).names
+
+def excel_to_parquet(xlsx_path, cache_dir):
+    """
+    Converts an Excel input to Parquet once; the copy in `cache_dir` is reused
+    while the workbook's size and modification time are unchanged.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(xlsx_path))[0]
+    parquet_path = os.path.join(cache_dir, f"{stem}.parquet")
+    meta_path = os.path.join(cache_dir, f"{stem}.json")
+    stat = os.stat(xlsx_path)
+    signature = {"source": os.path.abspath(xlsx_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if os.path.exists(parquet_path) and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as fh:
+            if json.load(fh) == signature:
+                return parquet_path
+    print(f"Converting {xlsx_path} to {parquet_path}...")
+    write_table(pd.read_excel(xlsx_path), parquet_path)
+    with open(meta_path, 'w', encoding='utf-8') as fh:
+        json.dump(signature, fh)
+    return parquet_path
+
+def read_table(path, columns=None, cache_dir=None):
+    """
+    Reads a Parquet, Feather, CSV or Excel table, loading only `columns` when given
+    (columns missing from the file are ignored). Excel files are converted to Parquet
+    in `cache_dir` first when one is given.
+    """
+    lower = path.lower()
+    if lower.endswith((".xlsx", ".xls")):
+        if cache_dir is None:
+            df = pd.read_excel(path)
+            return df[[c for c in columns if c in df.columns]] if columns is not None else df
+        path, lower = excel_to_parquet(path, cache_dir), ".parquet"
+    if lower.endswith(".csv"):
+        return pd.read_csv(path, usecols=lambda c: columns is None or c in columns)
+    if columns is not None:
+        available = table_columns(path)
+        columns = [c for c in columns if c in available]
+    if lower.endswith((".feather", ".arrow")):
+        return feather.read_feather(path, columns=columns)
+    return pd.read_parquet(path, columns=columns)
@@ -0,0 +1,170 @@
+# src/topsis.py
+import numpy as np
+import pandas as pd
+
+STABILITY_LABELS = [  # (lower bound, Korean, English)
+    (0.95, '매우 안정적', 'Very Stable'),
+    (0.85, '안정적', 'Stable'),
+    (0.70, '보통', 'Moderate'),
+    (0.0, '불안정', 'Unstable'),
+]
+ROBUSTNESS_LABELS = [(0.9, '높음', 'High'), (0.7, '보통', 'Medium'), (0.0, '낮음', 'Low')]
+
+def _label(value, labels):
+    for bound, ko, en in labels:
+        if value >= bound:
+            return ko, en
+    return labels[-1][1:]
+
+def vector_normalize(matrix):
+    """Column-wise vector normalization; all-zero columns stay zero."""
+    matrix = np.asarray(matrix, dtype=float)
+    norms = np.sqrt(np.sum(matrix**2, axis=0))
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+def benefit_mask(n_criteria, benefit_criteria):
+    mask = np.zeros(n_criteria, dtype=bool)
+    mask[list(benefit_criteria)] = True
+    return mask
+
+def entropy_weights(matrix):
+    """
+    Shannon-entropy objective weights (Shannon, 1948).
+    Returns (weights, entropy values) per criterion.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    col_sums = matrix.sum(axis=0)
+    p = np.divide(matrix, col_sums, out=np.zeros_like(matrix), where=col_sums > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plogp = np.where(p > 0, p * np.log(p), 0.0)
+    entropy = -plogp.sum(axis=0) / np.log(matrix.shape[0]) if matrix.shape[0] > 1 else np.ones(matrix.shape[1])
+    divergence = 1 - entropy
+    total = divergence.sum()
+    weights = divergence / total if total > 0 else np.full(matrix.shape[1], 1 / matrix.shape[1])
+    return weights, entropy
+
+def combine_weights(objective, subjective):
+    """Normalized geometric mean of objective and subjective weights."""
+    combined = np.sqrt(np.asarray(objective) * np.asarray(subjective))
+    return combined / combined.sum()
+
+def regularized_inverse_covariance(norm_matrix, shrinkage=0.1):
+    """
+    Inverse of the criteria covariance, shrunk towards a scaled identity so that it
+    stays well-conditioned with few regions: (1 - a) * S + a * tr(S) / C * I.
+    """
+    n_criteria = norm_matrix.shape[1]
+    cov = np.atleast_2d(np.cov(norm_matrix, rowvar=False)) if norm_matrix.shape[0] > 1 else np.eye(n_criteria)
+    return shrunk_inverse(cov, shrinkage)
+
+def shrunk_inverse(cov, shrinkage=0.1):
+    """Pseudo-inverse of a covariance matrix after shrinkage towards tr(cov) / C * I."""
+    n_criteria = cov.shape[0]
+    target = np.trace(cov) / n_criteria if np.trace(cov) > 0 else 1.0
+    regularized = (1 - shrinkage) * cov + shrinkage * target * np.eye(n_criteria)
+    return np.linalg.pinv(regularized)
+
+def batched_topsis(matrix, weights, benefit_criteria, distance="euclidean", shrinkage=0.1, chunk_size=4096):
+    """
+    TOPSIS closeness for many weight vectors at once.
+    - `weights`: (n_criteria,) or (n_samples, n_criteria) array of non-negative weights.
+    - `distance`: "euclidean" or "mahalanobis" (regularized covariance, see regularized_inverse_covariance).
+    With non-negative weights the ideal and anti-ideal points are fixed per criterion, so each
+    squared distance is a quadratic form in the weights and a chunk of samples is scored
+    with a few matrix products. Returns an (n_samples, n_regions) array (1-D for one vector).
+    """
+    weights = np.asarray(weights, dtype=float)
+    single = weights.ndim == 1
+    weights = np.atleast_2d(weights)
+
+    norm_matrix = vector_normalize(matrix)
+    mask = benefit_mask(norm_matrix.shape[1], benefit_criteria)
+    col_max, col_min = norm_matrix.max(axis=0), norm_matrix.min(axis=0)
+    pis = np.where(mask, col_max, col_min)
+    nis = np.where(mask, col_min, col_max)
+    d_pis, d_nis = norm_matrix - pis, norm_matrix - nis
+
+    if distance == "euclidean":
+        def squared_distance(w, d):
+            return (w**2) @ (d**2).T
+    elif distance == "mahalanobis":
+        inv_cov = regularized_inverse_covariance(norm_matrix, shrinkage)
+        def squared_distance(w, d):
+            # sum_ij w_i d_ri S^-1_ij d_rj w_j for every (sample, region)
+            return np.einsum('si,rij,sj->sr', w, d[:, :, None] * inv_cov[None] * d[:, None, :], w, optimize=True)
+    else:
+        raise ValueError(f"Unknown TOPSIS distance '{distance}'.")
+
+    closeness = np.empty((weights.shape[0], norm_matrix.shape[0]))
+    for start in range(0, weights.shape[0], chunk_size):
+        w = weights[start:start + chunk_size]
+        to_pis = np.sqrt(np.clip(squared_distance(w, d_pis), 0, None))
+        to_nis = np.sqrt(np.clip(squared_distance(w, d_nis), 0, None))
+        total = to_pis + to_nis
+        closeness[start:start + chunk_size] = np.divide(to_nis, total, out=np.zeros_like(total), where=total > 0)
+    return closeness[0] if single else closeness
+
+def enhanced_topsis(matrix, weights, benefit_criteria, distance="euclidean"):
+    """Performs TOPSIS analysis with normalized data."""
+    return batched_topsis(matrix, weights, benefit_criteria, distance=distance)
+
+def perturb_weights(base_weights, n_samples=1000, concentration=200.0, seed=42):
+    """
+    Seeded Monte Carlo weight vectors drawn from a Dirichlet centred on `base_weights`;
+    a larger `concentration` keeps the samples closer to the base.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.asarray(base_weights, dtype=float)
+    base = base / base.sum()
+    return rng.dirichlet(np.maximum(base * concentration, 1e-6), size=n_samples)
+
+def rank_scores(scores):
+    """Ranks along the last axis, 1 = highest score."""
+    order = np.argsort(-scores, axis=-1, kind='stable')
+    return np.argsort(order, axis=-1, kind='stable') + 1
+
+def topsis_sensitivity(matrix, base_weights, benefit_criteria, n_samples=1000, concentration=200.0,
+                       distance="euclidean", ci=0.95, seed=42, chunk_size=4096):
+    """
+    Monte Carlo weight sensitivity of TOPSIS closeness.
+    Scores `n_samples` perturbed weight vectors in one batched pass and returns one row per
+    region with the baseline score and rank, the mean/std and confidence interval of the
+    score, the mean/std of the rank, and stability measures:
+    - score_stability: 1 - coefficient of variation of the score (clipped to [0, 1]);
+    - ranking_stability: share of samples keeping the baseline rank.
+    """
+    baseline = batched_topsis(matrix, base_weights, benefit_criteria, distance=distance)
+    samples = perturb_weights(base_weights, n_samples, concentration, seed)
+    scores = batched_topsis(matrix, samples, benefit_criteria, distance=distance, chunk_size=chunk_size)
+    ranks = rank_scores(scores)
+    baseline_rank = rank_scores(baseline)
+
+    alpha = (1 - ci) / 2
+    mean, std = scores.mean(axis=0), scores.std(axis=0)
+    cv = np.divide(std, mean, out=np.zeros_like(std), where=mean > 0)
+    stats = pd.DataFrame({
+        'topsis_score': baseline,
+        'ranking': baseline_rank,
+        'score_mean': mean,
+        'score_std': std,
+        'confidence_interval_lower': np.quantile(scores, alpha, axis=0),
+        'confidence_interval_upper': np.quantile(scores, 1 - alpha, axis=0),
+        'rank_mean': ranks.mean(axis=0),
+        'rank_std': ranks.std(axis=0),
+        'score_stability': np.clip(1 - cv, 0, 1),
+        'ranking_stability': (ranks == baseline_rank[None, :]).mean(axis=0),
+    })
+    labels = stats['score_stability'].map(lambda v: _label(v, STABILITY_LABELS))
+    stats['stability_interpretation_ko'] = labels.str[0]
+    stats['stability_interpretation_en'] = labels.str[1]
+    return stats
+
+def sensitivity_summary(stats):
+    """One-row robustness summary (sensitivity_analysis_summary.csv)."""
+    mean_stability = float(stats['score_stability'].mean())
+    ko, en = _label(mean_stability, ROBUSTNESS_LABELS)
+    return pd.DataFrame([{
+        'mean_score_stability': mean_stability,
+        'overall_robustness_ko': ko,
+        'overall_robustness_en': en,
+    }])
@@ -1,18 +1,81 @@
 # src/utils.py
 import os
+import re
+import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib_scalebar.scalebar import ScaleBar
 
-def fix_korean(col):
+HANGUL = re.compile('[\uac00-\ud7a3]')
+
+def repair_korean_text(value):
     """
-    Decodes a column from latin1 to cp949 to fix broken Korean characters.
+    cp949 text that was decoded as latin1 (e.g. '¼­¿ïÆ¯º°½Ã') back to Hangul.
+    Returns None when `value` is not such mojibake.
     """
+    if not isinstance(value, str) or value.isascii():
+        return None
     try:
-        if col.dtype == 'object':
-            return col.str.decode('latin1').str.encode('cp949').str.decode('cp949')
-    except Exception:
-        return col
-    return col
+        repaired = value.encode('latin1').decode('cp949')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return None
+    return repaired if HANGUL.search(repaired) else None
+
+def _repair_uniques(uniques, sample_size, threshold):
+    """Repaired distinct values, or None when the first `sample_size` of them do not look like mojibake."""
+    candidates = [v for v in uniques[:sample_size] if isinstance(v, str) and not v.isascii()]
+    if not candidates or sum(repair_korean_text(v) is not None for v in candidates) < threshold * len(candidates):
+        return None
+    return np.array([r if (r := repair_korean_text(v)) is not None else v for v in uniques], dtype=object)
+
+def repair_korean_column(col, sample_size=200, threshold=0.5):
+    """
+    Fixes broken Korean characters in one column.
+    - Detection looks at the first `sample_size` distinct values; the column is repaired
+      when at least `threshold` of its non-ASCII ones decode to Hangul.
+    - Only the distinct values are decoded (factorize / categories) and mapped back, so
+      repeated region names cost one decode each.
+    Returns (column, whether it was repaired).
+    """
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        fixed = _repair_uniques(col.cat.categories.to_numpy(dtype=object), sample_size, threshold)
+        if fixed is None:
+            return col, False
+        if len(set(fixed)) == len(fixed):
+            return col.cat.rename_categories(fixed), True
+        col = col.astype(object)
+    elif col.dtype != object and not isinstance(col.dtype, pd.StringDtype):
+        return col, False
+
+    codes, uniques = pd.factorize(col)
+    fixed = _repair_uniques(np.asarray(uniques, dtype=object), sample_size, threshold)
+    if fixed is None:
+        return col, False
+    values = col.to_numpy(dtype=object).copy()
+    values[codes >= 0] = fixed[codes[codes >= 0]]
+    return pd.Series(values, index=col.index, name=col.name, dtype=col.dtype), True
+
+def repair_korean_columns(df, columns=None, sample_size=200, threshold=0.5):
+    """
+    Applies repair_korean_column to the text columns of `df` (or `columns`).
+    Returns (DataFrame, list of the repaired column names).
+    """
+    if columns is None:
+        columns = df.select_dtypes(include=['object', 'string', 'category']).columns
+    repaired = []
+    for name in columns:
+        fixed, changed = repair_korean_column(df[name], sample_size=sample_size, threshold=threshold)
+        if changed:
+            df[name] = fixed
+            repaired.append(name)
+    return df, repaired
+
+def fix_korean(col):
+    """
+    Decodes a column from latin1 to cp949 to fix broken Korean characters
+    (see repair_korean_column).
+    """
+    return repair_korean_column(col)[0]
 
 def add_north_arrow(ax, x=0.95, y=0.95, size=0.05, lw=1.5):
     """
@@ -0,0 +1,98 @@
+# src/weight_learning.py
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
+from sklearn.model_selection import RepeatedKFold
+from threadpoolctl import threadpool_limits
+from table_io import read_table, write_table
+
+IMPACT_FEATURES = ['author_count', 'abstract_length', 'year_norm']
+
+def features_key(source_path, **config):
+    """
+    Cache key of a feature matrix: sha256 of the source paper table plus the topic and
+    feature configuration, so it can be checked before any preprocessing runs.
+    """
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps({"features": IMPACT_FEATURES, **config}, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def feature_cache_path(cache_dir, source_path, **config):
+    return os.path.join(cache_dir, f"features_{features_key(source_path, **config)}.parquet")
+
+def build_feature_matrix(df, topic_col='topic'):
+    """Impact features plus one-hot topic columns (topic_<id>) and the log1p citation target."""
+    X = df[IMPACT_FEATURES].astype(float).reset_index(drop=True)
+    if topic_col in df.columns:
+        topics = pd.get_dummies(df[topic_col].astype(int).to_numpy(), prefix=topic_col, dtype=float)
+        X = pd.concat([X, topics], axis=1)
+    X['target'] = np.log1p(df['citations'].to_numpy(dtype=float))
+    return X
+
+def save_feature_matrix(X, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_table(X, path)
+
+def load_feature_matrix(path):
+    """(X, y) from a feature matrix written by save_feature_matrix."""
+    X = read_table(path)
+    return X.drop(columns='target'), X['target']
+
+def _fit_fold(args):
+    X, y, train, test, seed, n_permutations, booster_params, threads = args
+    # Pool workers use one OpenMP thread each so parallel folds do not oversubscribe the cores
+    with threadpool_limits(limits=threads):
+        model = HistGradientBoostingRegressor(random_state=seed, **booster_params)
+        model.fit(X[train], y[train])
+        # Histogram boosters have no impurity importances; permutation importance is model-agnostic
+        result = permutation_importance(model, X[test], y[test], n_repeats=n_permutations, random_state=seed)
+    return model.score(X[test], y[test]), model.n_iter_, result.importances_mean
+
+def cv_feature_importances(X, y, n_splits=5, n_repeats=3, n_permutations=5, n_jobs=None,
+                           seed=42, max_iter=500, learning_rate=0.1, n_iter_no_change=20):
+    """
+    Repeated k-fold estimate of the feature importances for log citations.
+    - Each fold fits a HistGradientBoostingRegressor with early stopping on an internal
+      validation split, then scores permutation importances on the held-out fold.
+    - Folds run in a process pool of `n_jobs` workers (all cores by default; 1 runs serially).
+    Returns (per-feature DataFrame of mean/std/CI of the importances, per-fold DataFrame
+    of held-out R-squared and boosting iterations).
+    """
+    columns = list(X.columns)
+    X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+    booster_params = dict(max_iter=max_iter, learning_rate=learning_rate, early_stopping=True,
+                          validation_fraction=0.1, n_iter_no_change=n_iter_no_change)
+    splits = RepeatedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=seed).split(X)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    parallel = n_jobs > 1
+    tasks = [(X, y, train, test, seed + i, n_permutations, booster_params, 1 if parallel else None)
+             for i, (train, test) in enumerate(splits)]
+    if parallel:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_fit_fold, tasks))
+    else:
+        results = [_fit_fold(task) for task in tasks]
+
+    importances = np.array([r[2] for r in results])
+    summary = pd.DataFrame({
+        'importance_mean': importances.mean(axis=0),
+        'importance_std': importances.std(axis=0, ddof=1) if len(results) > 1 else 0.0,
+        'ci_lower': np.quantile(importances, 0.025, axis=0),
+        'ci_upper': np.quantile(importances, 0.975, axis=0),
+    }, index=pd.Index(columns, name='feature'))
+    folds = pd.DataFrame({'fold': np.arange(len(results)), 'r2': [r[0] for r in results],
+                          'n_iter': [r[1] for r in results]})
+    return summary, folds
+
+def importance_weights(summary, features=IMPACT_FEATURES):
+    """Impact-score weights: the mean importances of `features`, clipped at 0 and summing to 1."""
+    weights = summary.loc[features, 'importance_mean'].clip(lower=0).to_numpy()
+    return weights / weights.sum() if weights.sum() > 0 else np.full(len(features), 1 / len(features))
@@ -0,0 +1,194 @@
+# src/whatif_service.py
+import os
+import json
+import math
+import time
+import argparse
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import shapely
+from spatial_aggregation import RATIO_COLUMNS
+from layer_store import load_processed_layer
+from table_io import read_table
+from topsis import enhanced_topsis
+
+DEFAULT_WEIGHTS = [0.4, 0.4, 0.2]
+DEFAULT_BENEFIT = [0, 1]  # supply_ratio, demand_ratio
+
+def _minmax(x, high=1.0):
+    span = x.max() - x.min() if len(x) else 0
+    return (x - x.min()) / span * high if span > 0 else np.zeros_like(x)
+
+class WhatIfModel:
+    """
+    In-memory state of the what-if service, loaded once from the stage outputs:
+    - the per-region indicator matrix (zeb_opportunity_index.csv, stage 02);
+    - the regional Technology Supply Index (mismatch table of stage 06, or the paper table);
+    - admin geometries, simplified by `simplify_tolerance` metres and pre-serialized as GeoJSON.
+    Scenarios are scored with enhanced_topsis; the `cache_size` most recent responses are kept.
+    """
+    def __init__(self, reports_path="output/reports", processed_path="data/processed", simplify_tolerance=500.0,
+                 cache_size=1024):
+        demand = pd.read_csv(os.path.join(reports_path, "zeb_opportunity_index.csv"))
+        demand = demand.groupby('SIDO_NM', sort=False)[list(RATIO_COLUMNS.values())].first()
+        self.regions = demand.index.to_numpy()
+        self.matrix = demand.to_numpy(dtype=float)
+        self.supply = self._load_supply(reports_path).reindex(self.regions).fillna(0).to_numpy(dtype=float)
+        self.region_pos = {region: i for i, region in enumerate(self.regions)}
+
+        admin = load_processed_layer("admin_boundaries", processed_path, columns=['SIDO_NM'])
+        admin = admin.dissolve(by='SIDO_NM')
+        admin['geometry'] = shapely.simplify(admin.geometry.to_numpy(), simplify_tolerance, preserve_topology=True)
+        admin = admin.to_crs("EPSG:4326")
+        self.geojson = {region: shapely.to_geojson(geom) for region, geom in zip(admin.index, admin.geometry)}
+        self._score = lru_cache(maxsize=cache_size)(self._score_uncached)
+        print(f"Loaded {len(self.regions)} regions ({sum(map(len, self.geojson.values())) / 1024:.0f} KiB of GeoJSON).")
+
+    @staticmethod
+    def _load_supply(reports_path):
+        """Mean Technology Supply Index per region, from stage 06 output or else the paper table."""
+        for name in ("zeb_mismatch_analysis_results.parquet", "comprehensive_paper_analysis.parquet"):
+            path = os.path.join(reports_path, name)
+            if os.path.exists(path):
+                df = read_table(path, columns=['SIDO_NM', 'Technology_Supply_Index'])
+                if 'SIDO_NM' in df.columns:
+                    return df.groupby('SIDO_NM')['Technology_Supply_Index'].mean()
+        print("Warning: no regional Technology Supply Index found; the Mismatch Index uses zero supply.")
+        return pd.Series(dtype=float)
+
+    def parse(self, request):
+        """Validates a scenario request and returns its hashable cache key."""
+        if not isinstance(request, dict):
+            raise ValueError("The request body must be a JSON object.")
+        weights = request.get('weights', DEFAULT_WEIGHTS)
+        if not isinstance(weights, list):
+            raise ValueError("'weights' must be a JSON list.")
+        weights = [float(w) for w in weights]
+        if (len(weights) != self.matrix.shape[1] or not all(math.isfinite(w) and w >= 0 for w in weights)
+                or not 0 < sum(weights) < math.inf):
+            raise ValueError(f"'weights' must be {self.matrix.shape[1]} finite non-negative numbers with a positive sum.")
+        benefit = request.get('benefit_criteria', DEFAULT_BENEFIT)
+        if not isinstance(benefit, list):
+            raise ValueError("'benefit_criteria' must be a JSON list.")
+        benefit = sorted({int(c) for c in benefit})
+        if any(c < 0 or c >= self.matrix.shape[1] for c in benefit):
+            raise ValueError("'benefit_criteria' must be criterion positions.")
+        regions = request.get('regions')
+        if regions is not None:
+            if not isinstance(regions, list) or not regions:
+                raise ValueError("'regions' must be a non-empty JSON list of region names.")
+            unknown = [r for r in regions if r not in self.region_pos]
+            if unknown:
+                raise ValueError(f"Unknown regions: {unknown}")
+            regions = tuple(sorted(set(regions), key=self.region_pos.get))
+        distance = request.get('distance', 'euclidean')
+        if distance not in ('euclidean', 'mahalanobis'):
+            raise ValueError("'distance' must be 'euclidean' or 'mahalanobis'.")
+        total = sum(weights)
+        return (tuple(round(w / total, 12) for w in weights), tuple(benefit), regions, distance,
+                bool(request.get('geojson', True)))
+
+    def _score_uncached(self, weights, benefit, regions, distance, with_geojson):
+        rows = np.arange(len(self.regions)) if regions is None else np.array([self.region_pos[r] for r in regions])
+        closeness = enhanced_topsis(self.matrix[rows], np.array(weights), list(benefit), distance=distance)
+        zeb_index = _minmax(closeness, 100.0)
+        supply = self.supply[rows]
+        mismatch = _minmax(zeb_index) - _minmax(supply)
+        order = np.argsort(-zeb_index, kind='stable')
+        ranks = np.empty(len(rows), dtype=int)
+        ranks[order] = np.arange(1, len(rows) + 1)
+        mismatch_ranks = np.empty(len(rows), dtype=int)
+        mismatch_ranks[np.argsort(-mismatch, kind='stable')] = np.arange(1, len(rows) + 1)
+
+        properties = [{'SIDO_NM': self.regions[r], 'ZEB_Opportunity_Index': float(zeb_index[i]),
+                       'ranking': int(ranks[i]), 'Technology_Supply_Index': float(supply[i]),
+                       'Mismatch_Index': float(mismatch[i]), 'mismatch_ranking': int(mismatch_ranks[i])}
+                      for i, r in enumerate(rows)]
+        body = '{"rankings": ' + json.dumps([properties[i] for i in order], ensure_ascii=False)
+        if with_geojson:
+            # Geometries are pre-serialized; only the properties are encoded per scenario
+            features = ','.join('{"type": "Feature", "properties": ' + json.dumps(p, ensure_ascii=False)
+                                + ', "geometry": ' + self.geojson.get(p['SIDO_NM'], 'null') + '}' for p in properties)
+            body += ', "geojson": {"type": "FeatureCollection", "features": [' + features + ']}'
+        return (body + '}').encode('utf-8')
+
+    def score(self, request):
+        """JSON response bytes for a scenario request (cached by its normalized parameters)."""
+        return self._score(*self.parse(request))
+
+def make_handler(model):
+    class WhatIfHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status, message):
+            self._send(status, json.dumps({"error": message}).encode('utf-8'))
+
+        def do_GET(self):
+            if self.path == "/health":
+                info = model._score.cache_info()
+                self._send(200, json.dumps({"status": "ok", "regions": len(model.regions),
+                                            "cache_hits": info.hits, "cache_misses": info.misses}).encode('utf-8'))
+            elif self.path == "/regions":
+                self._send(200, json.dumps(list(model.regions), ensure_ascii=False).encode('utf-8'))
+            else:
+                self._error(404, "Unknown path; use POST /scenario, GET /regions or GET /health.")
+
+        def do_POST(self):
+            if self.path != "/scenario":
+                self._error(404, "Unknown path; use POST /scenario.")
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                started = time.perf_counter()
+                body = model.score(request)
+            except (ValueError, TypeError) as e:
+                self._error(400, str(e))
+                return
+            except Exception as e:
+                self.log_error("scenario failed: %r", e)
+                self._error(500, f"Internal error: {type(e).__name__}")
+                return
+            self.log_message("scenario scored in %.2f ms", (time.perf_counter() - started) * 1000)
+            self._send(200, body)
+
+        def log_message(self, format, *args):
+            if not self.server.quiet:
+                super().log_message(format, *args)
+
+    return WhatIfHandler
+
+def serve(host="127.0.0.1", port=8765, quiet=False, **model_kwargs):
+    """Loads the model once and serves it until interrupted."""
+    model = WhatIfModel(**model_kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(model))
+    server.quiet = quiet
+    print(f"What-if service listening on http://{host}:{port} (POST /scenario)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident what-if service for the ZEB opportunity and mismatch indices.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--simplify", type=float, default=500.0, help="geometry simplification tolerance (m)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="scenarios kept in the LRU cache")
+    parser.add_argument("--quiet", action="store_true", help="do not log requests")
+    args = parser.parse_args()
+    serve(args.host, args.port, quiet=args.quiet, simplify_tolerance=args.simplify, cache_size=args.cache_size)
+
+if __name__ == "__main__":
+    main()